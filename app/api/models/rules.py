@@ -0,0 +1,10 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+from app.services.pi_light.day import Day
+
+
+class RuleBatchSummary(BaseModel):
+    received: int
+    rules: Dict[Day, int]
@@ -0,0 +1,17 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.services.pi_light.color import Color
+from app.services.pi_light.mode import Mode
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.state import State
+
+
+class LightStatus(BaseModel):
+    color: Color
+    mode: Mode
+    state: State
+    rule: Optional[Rule]
+    # seconds left of the cross-fade in progress
+    transition: Optional[float]
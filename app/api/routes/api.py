@@ -1,20 +1,46 @@
+import asyncio
 from datetime import timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, Body, Depends, HTTPException
-from starlette.status import HTTP_400_BAD_REQUEST
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.status import HTTP_304_NOT_MODIFIED, HTTP_400_BAD_REQUEST
 
-from app.core.light import get_light
+from app.api.models.rules import RuleBatchSummary
+from app.api.models.status import LightStatus
+from app.core.config import Settings
+from app.core.light import get_light, get_light_async, get_persister
+from app.core.settings import get_settings
 from app.services.pi_light.color import Color
-from app.services.pi_light.day import Day
 from app.services.pi_light.light import Light
+from app.services.pi_light.metrics import CONTENT_TYPE, Exposition
 from app.services.pi_light.mode import Mode
+from app.services.pi_light.persistence import RulePersister
 from app.services.pi_light.rule import Rule
 from app.services.pi_light.rule_manager import RuleDoesNotExistError
 from app.services.pi_light.state import State
 
 router = APIRouter()
 
+RULES_RESPONSES: Dict[Union[int, str], Dict[str, Any]] = {
+    200: {"content": {"application/json": {"schema": {"type": "object"}}}}
+}
+
+
+def rules_response(light: Light, request: Optional[Request] = None) -> Response:
+    """
+    All rules as JSON from the rule manager's cache, or 304 Not Modified if
+    the request's If-None-Match already names the current ETag.
+    """
+    etag, body = light.rule_manager.rules_json()
+    headers = {"ETag": etag}
+    if request is not None:
+        if_none_match = request.headers.get("if-none-match", "")
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 
 @router.get(
     "/color",
@@ -22,7 +48,7 @@ router = APIRouter()
     summary="Get the current color",
     response_description="The current color",
 )
-def color(light: Light = Depends(get_light)) -> Color:
+async def color(light: Light = Depends(get_light_async)) -> Color:
     return light.color
 
 
@@ -32,7 +58,7 @@ def color(light: Light = Depends(get_light)) -> Color:
     summary="Get the current light state",
     response_description="The current state",
 )
-def state(light: Light = Depends(get_light)) -> State:
+async def state(light: Light = Depends(get_light_async)) -> State:
     return light.state()
 
 
@@ -42,16 +68,84 @@ def state(light: Light = Depends(get_light)) -> State:
     summary="Get the current light mode",
     response_description="The current mode",
 )
-def mode(light: Light = Depends(get_light)) -> Mode:
+async def mode(light: Light = Depends(get_light_async)) -> Mode:
     return light.mode()
 
 
+async def status_events(
+    light: Light, interval: float, keepalive: float
+) -> AsyncIterator[str]:
+    """
+    Server-sent events of the light's status, sent when it changes but at most
+    once per interval. Changes in between are coalesced, so a slow client
+    only delays its own stream.
+    """
+    with light.status_feed.subscribe() as changed:
+        last = None
+        while True:
+            changed.clear()
+            status = LightStatus(
+                color=light.color,
+                mode=light.mode(),
+                state=light.state(),
+                rule=light.rule_manager.current_rule()[0],
+                transition=light.transition_remaining(),
+            ).json()
+            if status != last:
+                yield f"data: {status}\n\n"
+                last = status
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.wait_for(changed.wait(), keepalive)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    summary="Stream the light's status as server-sent events",
+    response_description="An event with the color, mode, state, current rule and "
+    "transition whenever they change",
+)
+def stream(
+    light: Light = Depends(get_light), settings: Settings = Depends(get_settings)
+) -> StreamingResponse:
+    return StreamingResponse(
+        status_events(
+            light,
+            settings.stream_interval_ms / 1000,
+            settings.stream_keepalive_ms / 1000,
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@router.get(
+    "/metrics",
+    response_class=Response,
+    summary="Get render loop and storage metrics",
+    response_description="Metrics in the Prometheus text format",
+)
+def metrics(
+    light: Light = Depends(get_light),
+    persister: RulePersister = Depends(get_persister),
+) -> Response:
+    exposition = Exposition()
+    light.collect_metrics(exposition)
+    persister.collect_metrics(exposition)
+    return Response(exposition.text(), media_type=CONTENT_TYPE)
+
+
 @router.get(
     "/rules/current",
     summary="Get the current rule and percentage through the rule",
     response_description="The current rule and percentage through the rule",
 )
-def current_rule(light: Light = Depends(get_light)) -> Tuple[Optional[Rule], float]:
+async def current_rule(
+    light: Light = Depends(get_light_async),
+) -> Tuple[Optional[Rule], float]:
     return light.rule_manager.current_rule()
 
 
@@ -60,7 +154,9 @@ def current_rule(light: Light = Depends(get_light)) -> Tuple[Optional[Rule], flo
     summary="Get the next rule and time until the next rule",
     response_description="The next rule and time until the next rule",
 )
-def next_rule(light: Light = Depends(get_light)) -> Tuple[Optional[Rule], timedelta]:
+async def next_rule(
+    light: Light = Depends(get_light_async),
+) -> Tuple[Optional[Rule], timedelta]:
     return light.rule_manager.next_rule()
 
 
@@ -68,36 +164,52 @@ def next_rule(light: Light = Depends(get_light)) -> Tuple[Optional[Rule], timede
     "/rules",
     summary="Get the set of all rules",
     response_description="The set of all rules",
+    responses={**RULES_RESPONSES, 304: {"description": "The rules are unchanged"}},
 )
-def rules(light: Light = Depends(get_light)) -> Dict[Day, List[Rule]]:
-    return light.rule_manager.rules
+def rules(request: Request, light: Light = Depends(get_light)) -> Response:
+    return rules_response(light, request)
 
 
 @router.post(
     "/rules",
     summary="Add a new rule to the set of all rules",
     response_description="The updated set of all rules",
+    responses=RULES_RESPONSES,
 )
-def add_rule(
-    rule: Rule = Body(...), light: Light = Depends(get_light)
-) -> Dict[Day, List[Rule]]:
+def add_rule(rule: Rule = Body(...), light: Light = Depends(get_light)) -> Response:
     light.rule_manager.add_rule(rule)
-    return light.rule_manager.rules
+    return rules_response(light)
+
+
+@router.post(
+    "/rules/batch",
+    response_model=RuleBatchSummary,
+    summary="Add many rules to the set of all rules",
+    response_description="The number of rules received and of rules per day",
+)
+def add_rules(
+    rules: List[Rule] = Body(...), light: Light = Depends(get_light)
+) -> RuleBatchSummary:
+    light.rule_manager.add_rules(rules)
+    return RuleBatchSummary(
+        received=len(rules),
+        rules={
+            day: len(r) for day, r in light.rule_manager.rule_set.all_rules().items()
+        },
+    )
 
 
 @router.delete(
     "/rules",
     summary="Remove a rule from the set of all rules",
     response_description="The updated set of all rules",
-    responses={400: {}},
+    responses={**RULES_RESPONSES, 400: {}},
 )
-def remove_rule(
-    rule: Rule = Body(...), light: Light = Depends(get_light)
-) -> Dict[Day, List[Rule]]:
+def remove_rule(rule: Rule = Body(...), light: Light = Depends(get_light)) -> Response:
     try:
         light.rule_manager.remove_rule(rule)
     except RuleDoesNotExistError:
         raise HTTPException(
             status_code=HTTP_400_BAD_REQUEST, detail="Rule does not exist"
         )
-    return light.rule_manager.rules
+    return rules_response(light)
@@ -1,11 +1,17 @@
-from datetime import datetime, time, timedelta
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Tuple
 
+import anyio
 import humanize
 from fastapi import APIRouter, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Template
 from loguru import logger
+from markupsafe import Markup
 from pydantic import ValidationError
+from starlette.datastructures import FormData
 
 from app.core.config import Settings
 from app.core.light import get_light
@@ -15,29 +21,56 @@ from app.services.pi_light.day import Day
 from app.services.pi_light.light import Light
 from app.services.pi_light.mode import Mode
 from app.services.pi_light.rule import Rule
-from app.services.pi_light.rule_manager import RuleDoesNotExistError
 
 templates = Jinja2Templates(directory="app/templates")
 router = APIRouter()
 
 
+class VersionedFragment:
+    """A template fragment rendered once per version of its source."""
+
+    def __init__(self, template: Template):
+        self.template = template
+        self._cached: Tuple[Any, int, Markup] = (None, -1, Markup())
+
+    def render(self, source: Any, version: int, **context: Any) -> Markup:
+        cached_source, cached_version, html = self._cached
+        if cached_source is not source or cached_version != version:
+            html = Markup(self.template.render(**context))
+            self._cached = (source, version, html)
+        return html
+
+
+# compiled once at import rather than on the first request
+light_template = templates.get_template("light.html")
+rules_fragment = VersionedFragment(templates.get_template("rules.html"))
+
+
 @router.get("/favicon.ico")
 async def favicon():
     return FileResponse("app/templates/favicon.ico")
 
 
+@lru_cache()
+def form_limiter() -> anyio.CapacityLimiter:
+    # forms are handled by at most this many threads of the shared threadpool,
+    # so a slow form submission never starves the API routes
+    return anyio.CapacityLimiter(get_settings().form_workers)
+
+
 @router.route("/", methods=["GET", "POST"])
 async def light_form(request: Request):
-    light = get_light()
     form_data = await request.form()
+    return await anyio.to_thread.run_sync(
+        handle_form, get_light(), form_data, limiter=form_limiter()
+    )
+
+
+def handle_form(light: Light, form_data: FormData) -> HTMLResponse:
     if "add_rule" in form_data.keys():
         try:
-            start_time = time_to_msec(
-                datetime.strptime(form_data.get("start_time"), "%H:%M").time()
-            )
-            stop_time = time_to_msec(
-                datetime.strptime(form_data.get("stop_time"), "%H:%M").time()
-            )
+            start_time = datetime.strptime(form_data.get("start_time"), "%H:%M").time()
+            stop_time = datetime.strptime(form_data.get("stop_time"), "%H:%M").time()
             start_color = Color.from_hex(
                 form_data.get("start_color"),
                 brightness=int(form_data.get("start_color_brightness")) / 100.0,
@@ -58,23 +91,23 @@ async def light_form(request: Request):
         except (ValidationError, ValueError) as e:
             logger.info(f"Issue parsing Add Rule form: {e}")
     elif "remove_rule" in form_data.keys():
-        for rule_hash in form_data.getlist("rule_hashes"):
-            try:
-                light.rule_manager.remove_rule_by_hash(int(rule_hash))
-            except RuleDoesNotExistError as e:
-                logger.info(f"Issue removing rule: {rule_hash}, {e}")
+        rule_hashes = map(int, form_data.getlist("rule_hashes"))
+        for rule_hash in light.rule_manager.remove_rules_by_hash(rule_hashes):
+            logger.info(f"Issue removing rule: {rule_hash}, rule does not exist")
     elif "set_mode" in form_data.keys():
         mode = Mode(form_data.get("mode"))
         light.set_mode(mode)
-        if mode == Mode.DEFAULT:
+        if mode != Mode.RULES:
             light.color = Color.from_hex(
                 form_data.get("mode_color"),
                 brightness=int(form_data.get("mode_color_brightness")) / 100.0,
             )
-    return render_light_template(request, light)
+    return render_light_template(light)
 
 
-def render_light_template(request, light: Light, settings: Settings = get_settings()):
+def render_light_template(
+    light: Light, settings: Settings = get_settings()
+) -> HTMLResponse:
     light_current_rule = light.rule_manager.current_rule()[0]
     current_rule_str = (
         light_current_rule.time_interval() if light_current_rule else "No Active Rule"
@@ -86,21 +119,18 @@ def render_light_template(request, light: Light, settings: Settings = get_settin
         else "No more rules today"
     )
     time_until_change = humanize.naturaldelta(light_next_rule[1])
-    return templates.TemplateResponse(
-        "light.html",
-        {
-            "request": request,
-            "current_time": datetime.now().strftime(settings.time_format),
-            "mode": light.mode(),
-            "current_rule_str": current_rule_str,
-            "current_color": light.color,
-            "next_rule": next_rule,
-            "time_until_change": time_until_change,
-            "rules": light.rule_manager.rules,
-        },
+    rule_set = light.rule_manager.rule_set
+    rules_html = rules_fragment.render(
+        light.rule_manager, rule_set.version, rule_set=rule_set
+    )
+    return HTMLResponse(
+        light_template.render(
+            current_time=datetime.now().strftime(settings.time_format),
+            mode=light.mode(),
+            current_rule_str=current_rule_str,
+            current_color=light.color,
+            next_rule=next_rule,
+            time_until_change=time_until_change,
+            rules_html=rules_html,
+        )
     )
-
-
-def time_to_msec(t: time) -> int:
-    td = datetime.combine(datetime.min, t) - datetime.min
-    return td // timedelta(milliseconds=1)
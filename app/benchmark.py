@@ -0,0 +1,295 @@
+"""
+Benchmarks of the rule engine, color math, render path and API, run with the
+fake board:
+
+    python -m app.benchmark results.json
+    python -m app.benchmark new.json --compare results.json
+
+Results are the best time per operation over several repeats, saved as JSON
+so runs on different versions or devices can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import timeit
+from itertools import cycle
+from math import ceil
+from tempfile import TemporaryDirectory
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Sequence
+
+from app.core.settings import get_settings
+from app.services.pi_light import fake_board
+from app.services.pi_light.animation import Renderer
+from app.services.pi_light.color import Color, Pixel
+from app.services.pi_light.day import Day
+from app.services.pi_light.frame import new_frame
+from app.services.pi_light.mode import Mode
+from app.services.pi_light.output import Output
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.rule_manager import RuleManager
+from app.services.pi_light.transition import Transition
+from app.services.simple_time import to_time
+
+
+class Options(NamedTuple):
+    rule_counts: Sequence[int] = (100, 1000, 10000)
+    # rules in the generated file timed with load_rules
+    file_rules: int = 10000
+    repeat: int = 5
+    # least seconds each repeat runs for
+    min_time: float = 0.2
+    seed: int = 0
+
+
+class Result(NamedTuple):
+    name: str
+    params: Dict[str, Any]
+    seconds: float
+    ops_per_second: float
+
+
+def measure(
+    name: str, function: Callable[[], Any], options: Options, **params: Any
+) -> Result:
+    timer = timeit.Timer(function)
+    number = 1
+    while timer.timeit(number) < options.min_time:
+        number *= 2
+    seconds = min(timer.repeat(options.repeat, number)) / number
+    return Result(name, params, seconds, 1 / seconds if seconds else float("inf"))
+
+
+def _color(rng: random.Random) -> Color:
+    return Color(
+        r=rng.randrange(256),
+        g=rng.randrange(256),
+        b=rng.randrange(256),
+        brightness=rng.random(),
+    )
+
+
+def _rules(count: int, rng: random.Random) -> List[Rule]:
+    """Count disjoint rules spread evenly over the week."""
+    days = list(Day)
+    per_day = ceil(count / len(days))
+    width = 86400 // per_day
+    return [
+        Rule(
+            day=days[index % len(days)],
+            start_time=to_time(index // len(days) * width),
+            stop_time=to_time(index // len(days) * width + width - 1),
+            start_color=_color(rng),
+            stop_color=_color(rng),
+        )
+        for index in range(count)
+    ]
+
+
+def rule_benchmarks(options: Options) -> Iterator[Result]:
+    rng = random.Random(options.seed)
+    for count in options.rule_counts:
+        rule_manager = RuleManager()
+        rule_manager.add_rules(_rules(count, rng))
+        # short rules overwrite parts of the existing ones, so the rule count
+        # stays about the same however often they are added
+        width = max(86400 * 7 // count, 2)
+        added = cycle(
+            Rule(
+                day=rng.choice(list(Day)),
+                start_time=to_time(start),
+                stop_time=to_time(start + rng.randrange(1, width)),
+                start_color=_color(rng),
+                stop_color=_color(rng),
+            )
+            for start in (rng.randrange(86400 - width) for _ in range(1000))
+        )
+        yield measure(
+            "add_rule",
+            lambda: rule_manager.add_rule(next(added)),
+            options,
+            rules=count,
+        )
+        for name in (
+            "current_rule",
+            "next_rule",
+            "current_color",
+            "current_layers",
+            "next_change",
+        ):
+            yield measure(name, getattr(rule_manager, name), options, rules=count)
+
+
+def color_benchmarks(options: Options) -> Iterator[Result]:
+    rng = random.Random(options.seed)
+    c1, c2 = _color(rng), _color(rng)
+    yield measure("Color.gradient", lambda: Color.gradient(c1, c2, 0.37), options)
+    p1, p2 = Pixel.from_color(c1), Pixel.from_color(c2)
+    yield measure("Pixel.gradient", lambda: Pixel.gradient(p1, p2, 0.37), options)
+
+
+def load_benchmarks(options: Options) -> Iterator[Result]:
+    # Rule.random draws from the shared random module
+    state = random.getstate()
+    random.seed(options.seed)
+    try:
+        rules = [Rule.random() for _ in range(options.file_rules)]
+    finally:
+        random.setstate(state)
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.jsonl")
+        with open(path, "w") as f:
+            f.write("\n".join(rule.json() for rule in rules))
+        yield measure(
+            "load_rules",
+            lambda: RuleManager().load_rules(path),
+            options._replace(repeat=min(options.repeat, 3)),
+            rules=options.file_rules,
+        )
+
+
+def render_benchmarks(options: Options) -> Iterator[Result]:
+    led_count = get_settings().led_count
+    color = Pixel(255, 128, 0, 0.5)
+    for mode in (Mode.RAINBOW, Mode.TWINKLE):
+        renderer = Renderer(fake_board.Board, led_count, 1000, 0.5)
+        yield measure(
+            "Renderer.render",
+            lambda: renderer.render(mode, color),
+            options,
+            mode=mode.value,
+            leds=led_count,
+        )
+    yield measure(
+        "Board.fill",
+        lambda: fake_board.Board.fill(color),
+        options,
+        leds=led_count,
+    )
+    output = Output(led_count, 2.2, 2)
+    frame = bytes(range(3 * led_count))
+    yield measure(
+        "Output.encode", lambda: output.encode(frame, 0.03), options, leds=led_count
+    )
+    transition = Transition(bytes(3 * led_count), frame, 1e6, 60)
+    fade_frame = new_frame(led_count)
+    yield measure(
+        "Transition.render",
+        lambda: transition.render(fade_frame),
+        options,
+        leds=led_count,
+    )
+
+
+def api_benchmarks(options: Options) -> Iterator[Result]:
+    # the test client is a dev dependency, so only needed here
+    from starlette.testclient import TestClient
+
+    from app.core.light import get_light, get_light_async
+    from app.main import app
+    from app.services.pi_light.light import Light
+
+    light = Light()
+    light.rule_manager.add_rules(_rules(1000, random.Random(options.seed)))
+    app.dependency_overrides[get_light] = lambda: light
+    app.dependency_overrides[get_light_async] = lambda: light
+    # without a with block the startup handlers, and so the render thread,
+    # do not run
+    client = TestClient(app)
+    try:
+        etag = client.get("/api/rules").headers["ETag"]
+        for path, headers in (
+            ("/api/color", {}),
+            ("/api/rules", {}),
+            ("/api/rules", {"If-None-Match": etag}),
+            ("/api/metrics", {}),
+        ):
+            yield measure(
+                "GET " + path,
+                lambda: client.get(path, headers=headers),
+                options,
+                conditional=bool(headers),
+            )
+    finally:
+        app.dependency_overrides.clear()
+
+
+BENCHMARKS = {
+    "rules": rule_benchmarks,
+    "color": color_benchmarks,
+    "load": load_benchmarks,
+    "render": render_benchmarks,
+    "api": api_benchmarks,
+}
+
+
+def run(options: Options, groups: Sequence[str] = tuple(BENCHMARKS)) -> Dict:
+    results = []
+    for group in groups:
+        for result in BENCHMARKS[group](options):
+            print(
+                f"{result.name:<20} {json.dumps(result.params):<40} "
+                f"{result.seconds * 1e6:12.2f}us",
+                file=sys.stderr,
+            )
+            results.append(result._asdict())
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "options": options._asdict(),
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Descriptions of the results slower than baseline by more than tolerance."""
+
+    def key(result: Dict) -> str:
+        return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+    before = {key(result): result["seconds"] for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        seconds = before.get(key(result))
+        if seconds and result["seconds"] > seconds * (1 + tolerance):
+            regressions.append(
+                f"{result['name']} {json.dumps(result['params'])} "
+                f"{result['seconds'] / seconds:.2f}x slower"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the rule engine, color math, render path and API"
+    )
+    parser.add_argument("output", help="JSON file the results are saved to")
+    parser.add_argument(
+        "--group", action="append", choices=list(BENCHMARKS), dest="groups"
+    )
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    defaults = Options()
+    parser.add_argument("--repeat", type=int, default=defaults.repeat)
+    parser.add_argument("--min-time", type=float, default=defaults.min_time)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+
+    options = Options(repeat=args.repeat, min_time=args.min_time, seed=args.seed)
+    report = run(options, args.groups or tuple(BENCHMARKS))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,8 +20,32 @@ class Settings(BaseSettings):
     led_count: int = 33
     default_brightness: float = 0.5
     rainbow_sleep_ms: int = 200
-    sleep_ms: int = 2000
+    fps: int = 30
+    # niceness of the render thread, negative values need CAP_SYS_NICE
+    render_nice: int = -10
+    switch_interval_ms: float = 1.0
+    # upper bound between refreshes, the light otherwise wakes only on changes
+    sleep_ms: int = 60000
+    # output gamma correction, 1.0 to disable, and bits of temporal dithering
+    # refreshed at dither_fps while the strip is between two output levels
+    # below dither_limit, where single steps are visible
+    gamma: float = 2.2
+    dither_bits: int = 2
+    dither_fps: int = 120
+    dither_limit: int = 32
+    # cross-fade between colors, modes and rules, 0 switches instantly
+    transition_ms: int = 500
+    transition_fps: int = 60
     default_rules: str = "default_rules.json"
+    # compiled rules, loaded instead of default_rules when present
+    rules_snapshot: str = "rules.snapshot"
+    # rule changes are saved to rules_snapshot at most this often
+    persist_delay_ms: int = 5000
+    # least time between two events of the status stream, per client
+    stream_interval_ms: int = 250
+    stream_keepalive_ms: int = 15000
+    # threads handling HTML form submissions at once
+    form_workers: int = 1
     time_format: str = "%A, %B %-d, %-I:%M:%S %p"
 
     class Config:
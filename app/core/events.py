@@ -1,11 +1,10 @@
-import threading
 from typing import Callable
 
 from fastapi import FastAPI
 from loguru import logger
 
 from app.core.config import Settings
-from app.core.light import get_light
+from app.core.light import get_light, get_persister
 from app.core.settings import get_settings
 from app.services.pi_light.mode import Mode
 
@@ -15,8 +14,11 @@ def create_start_app_handler(
 ) -> Callable:  # type: ignore
     async def start_app() -> None:
         get_light().set_mode(Mode.RULES)
-        get_light().rule_manager.load_rules(settings.default_rules)
-        threading.Thread(target=get_light().run, daemon=True).start()
+        rule_manager = get_light().rule_manager
+        if not rule_manager.load_snapshot(settings.rules_snapshot):
+            rule_manager.load_rules(settings.default_rules)
+        get_persister().start()
+        get_light().start()
 
     return start_app
 
@@ -24,6 +26,7 @@ def create_start_app_handler(
 def create_stop_app_handler(app: FastAPI) -> Callable:  # type: ignore
     @logger.catch
     async def stop_app() -> None:
-        pass
+        get_light().stop(timeout=5)
+        get_persister().stop()
 
     return stop_app
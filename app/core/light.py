@@ -1,8 +1,27 @@
 from functools import lru_cache
 
+from app.core.settings import get_settings
 from app.services.pi_light.light import Light
+from app.services.pi_light.persistence import RulePersister
 
 
 @lru_cache()
 def get_light() -> Light:
     return Light()
+
+
+async def get_light_async() -> Light:
+    # FastAPI runs sync dependencies in the threadpool, this one resolves on
+    # the event loop for the routes that never block. It calls get_light
+    # directly, so dependency_overrides of get_light must override this too
+    return get_light()
+
+
+@lru_cache()
+def get_persister() -> RulePersister:
+    settings = get_settings()
+    return RulePersister(
+        get_light().rule_manager,
+        settings.rules_snapshot,
+        settings.persist_delay_ms / 1000,
+    )
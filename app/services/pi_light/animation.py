@@ -0,0 +1,188 @@
+import time
+from abc import ABC, abstractmethod
+from math import ceil, cos, pi
+from random import random, sample
+from typing import Callable, Dict, Hashable, Optional, Type
+
+from app.core.settings import get_settings
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.frame import (
+    new_frame,
+    palette_frame,
+    rainbow_frame,
+    rainbow_positions,
+)
+from app.services.pi_light.mode import Mode
+
+ANIMATIONS: Dict[Mode, Type["Animation"]] = {}
+
+
+def register(mode: Mode) -> Callable[[Type["Animation"]], Type["Animation"]]:
+    def decorator(cls: Type["Animation"]) -> Type["Animation"]:
+        ANIMATIONS[mode] = cls
+        return cls
+
+    return decorator
+
+
+class Animation(ABC):
+    """
+    An effect rendering frames into a reusable RGB frame buffer. Frames are a
+    function of the time since the animation started, so frames dropped by the
+    renderer do not slow the effect down.
+    """
+
+    def __init__(self, led_count: int, color: Pixel):
+        self.led_count = led_count
+        self.color = color
+
+    @abstractmethod
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        """Write the frame elapsed seconds after the animation started."""
+
+
+@register(Mode.RAINBOW)
+class Rainbow(Animation):
+    def __init__(self, led_count: int, color: Pixel):
+        super().__init__(led_count, color)
+        self.positions = rainbow_positions(led_count)
+        self.steps_per_second = 1000 / get_settings().rainbow_sleep_ms
+
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        step = int(elapsed * self.steps_per_second) & 255
+        rainbow_frame(self.positions, step, frame)
+
+
+@register(Mode.BREATHE)
+class Breathe(Animation):
+    period = 4.0
+
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        level = (1 - cos(2 * pi * elapsed / self.period)) / 2
+        c = self.color
+        pixel = bytes((int(c.r * level), int(c.g * level), int(c.b * level)))
+        frame[:] = pixel * self.led_count
+
+
+@register(Mode.CHASE)
+class Chase(Animation):
+    spacing = 8
+    width = 2
+    pixels_per_second = 10.0
+
+    def __init__(self, led_count: int, color: Pixel):
+        super().__init__(led_count, color)
+        c = self.color
+        pattern = bytes((c.r, c.g, c.b)) * self.width
+        pattern += bytes(3 * (self.spacing - self.width))
+        # long enough to slice a full strip at any offset within the pattern
+        self.strip = pattern * (ceil(led_count / self.spacing) + 1)
+
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        offset = self.spacing - int(elapsed * self.pixels_per_second) % self.spacing
+        frame[:] = self.strip[3 * offset : 3 * (offset + self.led_count)]
+
+
+@register(Mode.TWINKLE)
+class Twinkle(Animation):
+    # fraction of pixels sparkling per second, and seconds to fade to half
+    sparkles_per_second = 0.5
+    half_life = 0.3
+
+    def __init__(self, led_count: int, color: Pixel):
+        super().__init__(led_count, color)
+        self.levels = bytearray(led_count)
+        self.last_elapsed = 0.0
+        c = self.color
+        self.channels = tuple(
+            bytes(value * level // 255 for level in range(256))
+            for value in (c.r, c.g, c.b)
+        )
+
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        delta = elapsed - self.last_elapsed
+        self.last_elapsed = elapsed
+        fade = 0.5 ** (delta / self.half_life)
+        self.levels = self.levels.translate(
+            bytes(int(level * fade) for level in range(256))
+        )
+        expected = self.sparkles_per_second * delta * self.led_count
+        count = int(expected) + (random() < expected % 1)  # nosec
+        for index in sample(range(self.led_count), min(count, self.led_count)):
+            self.levels[index] = 255
+        for channel, table in enumerate(self.channels):
+            frame[channel::3] = self.levels.translate(table)
+
+
+@register(Mode.GRADIENT_SWEEP)
+class GradientSweep(Animation):
+    steps_per_second = 32.0
+
+    def __init__(self, led_count: int, color: Pixel):
+        super().__init__(led_count, color)
+        self.positions = rainbow_positions(led_count)
+        # color to its complement and back around the 256 palette entries
+        c = self.color
+        r, g, b = (
+            bytes(
+                int(value + (255 - 2 * value) * (1 - abs(pos - 128) / 128))
+                for pos in range(256)
+            )
+            for value in (c.r, c.g, c.b)
+        )
+        self.palette = (r, g, b)
+
+    def render(self, frame: bytearray, elapsed: float) -> None:
+        step = int(elapsed * self.steps_per_second) & 255
+        palette_frame(self.positions, step, frame, self.palette)
+
+
+class Renderer:
+    """
+    Renders the animation for a mode to a board at a target frame rate. When
+    rendering falls behind by whole frames those frames are dropped, so the
+    renderer catches up instead of drifting further behind.
+    """
+
+    def __init__(
+        self,
+        board,
+        led_count: int,
+        fps: int,
+        default_brightness: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.board = board
+        self.led_count = led_count
+        self.frame_time = 1 / fps
+        self.default_brightness = default_brightness
+        self.clock = clock
+        self.frame = new_frame(led_count)
+        self.animation: Optional[Animation] = None
+        self.brightness = 0.0
+        self.frames = 0
+        self.dropped_frames = 0
+        self._key: Optional[Hashable] = None
+        self._started = 0.0
+        self._next_frame = 0.0
+
+    def render(self, mode: Mode, color: Pixel) -> float:
+        """Render a frame and return the seconds until the next one is due."""
+        now = self.clock()
+        if (mode, color) != self._key or self.animation is None:
+            self._key = (mode, color)
+            self.animation = ANIMATIONS[mode](self.led_count, color)
+            self._started = self._next_frame = now
+        behind = now - self._next_frame
+        if behind >= self.frame_time:
+            missed = int(behind / self.frame_time)
+            self.dropped_frames += missed
+            self._next_frame += missed * self.frame_time
+        self.animation.render(self.frame, now - self._started)
+        # effects that only use the color's hue fall back to the default
+        # brightness when the light has no brightness set
+        self.brightness = color.brightness or self.default_brightness
+        self.board.show(self.frame, self.brightness)
+        self.frames += 1
+        self._next_frame += self.frame_time
+        return max(self._next_frame - self.clock(), 0.0)
@@ -1,8 +1,31 @@
+from time import perf_counter
+from typing import Any, Callable, Optional, Tuple, Union
+
 import board
 import neopixel_spi as neopixel
 
 from app.core.settings import get_settings
-from app.services.pi_light.color import Color
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.metrics import Histogram
+from app.services.pi_light.output import Output
+
+
+def transmitter(pixels: Any) -> Callable[[bytearray], None]:
+    """
+    The pixels' raw write. PixelBuf's public show() rebuilds the device
+    buffer pixel by pixel and applies its own brightness, while frames here
+    arrive already encoded by Output. So they go to NeoPixel_SPI._transmit,
+    present in adafruit-circuitpython-neopixel-spi 1.0 with pixelbuf 1.1 as
+    locked. Fails at startup rather than on the first frame if an upgrade
+    removes it.
+    """
+    transmit = getattr(pixels, "_transmit", None)
+    if not callable(transmit):
+        raise RuntimeError(
+            f"{type(pixels).__name__} has no _transmit to write encoded frames, "
+            "use the adafruit-circuitpython-neopixel-spi version in poetry.lock"
+        )
+    return transmit
 
 
 class Board:
@@ -10,42 +33,47 @@ class Board:
         board.SPI(),
         get_settings().led_count,
         brightness=get_settings().default_brightness,
+        auto_write=False,
+    )
+    # last frame written by fill, None when the strip holds anything else
+    last_frame: Optional[Tuple[int, int, int, float]] = None
+    writes = 0
+    skipped_writes = 0
+    write_seconds = Histogram()
+    transmit = transmitter(pixels)
+    output = Output(
+        get_settings().led_count,
+        get_settings().gamma,
+        get_settings().dither_bits,
+        pixels.bpp,
+        pixels.byteorder,
+        get_settings().dither_limit,
     )
-    rainbow_step_num = 0
 
     @classmethod
-    def fill(cls, color: Color) -> None:
-        cls.pixels.brightness = color.brightness
-        cls.pixels.fill((color.r, color.g, color.b))
+    def fill(cls, pixel: Pixel) -> bool:
+        """
+        Fill the strip with pixel, returning whether it needs refreshing to
+        dither. An unchanged pixel is only written again while dithering.
+        """
+        frame = (pixel.r, pixel.g, pixel.b, pixel.brightness)
+        if frame == cls.last_frame and not cls.output.dithering:
+            cls.skipped_writes += 1
+            return False
+        cls.show(bytes((pixel.r, pixel.g, pixel.b)) * cls.pixels.n, pixel.brightness)
+        cls.last_frame = frame
+        return cls.output.dithering
 
     @classmethod
-    def rainbow_step(cls) -> None:
-        for i in range(cls.pixels.n):
-            pixel_index = (i * 256 // cls.pixels.n) + cls.rainbow_step_num
-            cls.pixels[i] = cls._wheel(pixel_index & 255)
-        cls.pixels.show()
-        cls.rainbow_step_num += 1
-        if cls.rainbow_step_num == 255:
-            cls.rainbow_step_num = 0
-
-    @staticmethod
-    def _wheel(pos):
-        # Input a value 0 to 255 to get a color value.
-        # The colours are a transition r - g - b - back to r.
-        if pos < 0 or pos > 255:
-            r = g = b = 0
-        elif pos < 85:
-            r = int(pos * 3)
-            g = int(255 - pos * 3)
-            b = 0
-        elif pos < 170:
-            pos -= 85
-            r = int(255 - pos * 3)
-            g = 0
-            b = int(pos * 3)
-        else:
-            pos -= 170
-            r = 0
-            g = int(pos * 3)
-            b = int(255 - pos * 3)
-        return r, g, b
+    def show(cls, frame: Union[bytes, bytearray], brightness: float) -> bool:
+        """
+        Write an RGB frame to the strip in one transfer, returning whether it
+        needs refreshing to dither. The device buffer is built with bulk byte
+        operations instead of PixelBuf's per-pixel item assignment.
+        """
+        started = perf_counter()
+        cls.transmit(cls.output.encode(frame, brightness))
+        cls.write_seconds.observe(perf_counter() - started)
+        cls.writes += 1
+        cls.last_frame = None
+        return cls.output.dithering
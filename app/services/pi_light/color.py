@@ -1,4 +1,5 @@
 from random import randint, random
+from typing import NamedTuple
 
 from pydantic import BaseModel, Extra, Field
 
@@ -43,3 +44,35 @@ class Color(BaseModel):
         b = c1.b + (c2.b - c1.b) * percentage
         brightness = c1.brightness + (c2.brightness - c1.brightness) * percentage
         return Color(r=r, g=g, b=b, brightness=brightness)
+
+
+class Pixel(NamedTuple):
+    """
+    A lightweight, immutable color for the render path. Unlike Color it is not
+    validated, so values must already be in range; convert at the API
+    boundary with from_color and to_color.
+    """
+
+    r: int = 0
+    g: int = 0
+    b: int = 0
+    brightness: float = 0.0
+
+    @staticmethod
+    def from_color(color: Color) -> "Pixel":
+        return Pixel(color.r, color.g, color.b, color.brightness)
+
+    def to_color(self) -> Color:
+        # values are already in range, skip pydantic validation
+        return Color.construct(r=self.r, g=self.g, b=self.b, brightness=self.brightness)
+
+    @staticmethod
+    def gradient(p1: "Pixel", p2: "Pixel", percentage: float) -> "Pixel":
+        r1, g1, b1, brightness1 = p1
+        r2, g2, b2, brightness2 = p2
+        return Pixel(
+            int(r1 + (r2 - r1) * percentage),
+            int(g1 + (g2 - g1) * percentage),
+            int(b1 + (b2 - b1) * percentage),
+            brightness1 + (brightness2 - brightness1) * percentage,
+        )
@@ -1,18 +1,44 @@
+from time import perf_counter
+from typing import Optional, Tuple, Union
+
 from loguru import logger
 
-from app.services.pi_light.color import Color
+from app.core.settings import get_settings
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.metrics import Histogram
+from app.services.pi_light.output import Output
 
 
 class Board:
-    rainbow_step_num = 0
+    last_frame: Optional[Tuple[int, int, int, float]] = None
+    writes = 0
+    skipped_writes = 0
+    write_seconds = Histogram()
+    output = Output(
+        get_settings().led_count,
+        get_settings().gamma,
+        get_settings().dither_bits,
+        dither_limit=get_settings().dither_limit,
+    )
 
     @classmethod
-    def fill(cls, color: Color) -> None:
-        logger.debug(f"Fill Board Color: {color}")
+    def fill(cls, pixel: Pixel) -> bool:
+        frame = (pixel.r, pixel.g, pixel.b, pixel.brightness)
+        if frame == cls.last_frame and not cls.output.dithering:
+            cls.skipped_writes += 1
+            return False
+        if frame != cls.last_frame:
+            logger.debug(f"Fill Board Color: {pixel}")
+        rgb = bytes((pixel.r, pixel.g, pixel.b))
+        cls.show(rgb * get_settings().led_count, pixel.brightness)
+        cls.last_frame = frame
+        return cls.output.dithering
 
     @classmethod
-    def rainbow_step(cls) -> None:
-        cls.rainbow_step_num += 1
-        if cls.rainbow_step_num == 255:
-            cls.rainbow_step_num = 0
-        logger.debug(f"Rainbow Step: {cls.rainbow_step_num}")
+    def show(cls, frame: Union[bytes, bytearray], brightness: float) -> bool:
+        started = perf_counter()
+        cls.output.encode(frame, brightness)
+        cls.write_seconds.observe(perf_counter() - started)
+        cls.writes += 1
+        cls.last_frame = None
+        return cls.output.dithering
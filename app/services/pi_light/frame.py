@@ -0,0 +1,89 @@
+from typing import Tuple, Union
+
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.output import brightness_scale
+
+# maps byte b to (b + step) & 255 when sliced as _ROTATE[step : step + 256]
+_ROTATE = bytes(range(256)) * 2
+
+
+def wheel(pos: int) -> Tuple[int, int, int]:
+    # Input a value 0 to 255 to get a color value.
+    # The colours are a transition r - g - b - back to r.
+    if pos < 0 or pos > 255:
+        r = g = b = 0
+    elif pos < 85:
+        r = int(pos * 3)
+        g = int(255 - pos * 3)
+        b = 0
+    elif pos < 170:
+        pos -= 85
+        r = int(255 - pos * 3)
+        g = 0
+        b = int(pos * 3)
+    else:
+        pos -= 170
+        r = 0
+        g = int(pos * 3)
+        b = int(255 - pos * 3)
+    return r, g, b
+
+
+# per-channel wheel palettes, usable as bytes.translate tables
+WHEEL_R = bytes(wheel(pos)[0] for pos in range(256))
+WHEEL_G = bytes(wheel(pos)[1] for pos in range(256))
+WHEEL_B = bytes(wheel(pos)[2] for pos in range(256))
+
+
+def new_frame(led_count: int) -> bytearray:
+    """An RGB frame, three bytes per pixel."""
+    return bytearray(3 * led_count)
+
+
+def paint(frame: bytearray, first: int, stop: int, pixel: Pixel) -> None:
+    """
+    Set pixels first to stop - 1 of frame to pixel, with its brightness
+    applied for showing at brightness 1.0, in one slice assignment. The range
+    is clipped to the frame.
+    """
+    led_count = len(frame) // 3
+    first, stop = min(first, led_count), min(stop, led_count)
+    if first >= stop:
+        return
+    brightness = brightness_scale(pixel.brightness)
+    rgb = bytes(
+        (
+            int(pixel.r * brightness),
+            int(pixel.g * brightness),
+            int(pixel.b * brightness),
+        )
+    )
+    frame[3 * first : 3 * stop] = rgb * (stop - first)
+
+
+def dim(frame: Union[bytes, bytearray], brightness: float) -> bytes:
+    """A copy of frame with brightness applied, for showing at brightness 1.0."""
+    scale = brightness_scale(brightness)
+    return bytes(frame).translate(bytes(int(v * scale) for v in range(256)))
+
+
+def rainbow_positions(led_count: int) -> bytes:
+    """Palette position of each pixel at step 0, spread evenly over the strip."""
+    return bytes(i * 256 // led_count & 255 for i in range(led_count))
+
+
+def palette_frame(
+    positions: bytes, step: int, frame: bytearray, palette: Tuple[bytes, bytes, bytes]
+) -> None:
+    """
+    Write each pixel's palette entry, rotated by step, into frame. The palette
+    is three 256-byte channel tables, so no per-pixel Python work is done.
+    """
+    rotated = positions.translate(_ROTATE[step : step + 256])
+    frame[0::3] = rotated.translate(palette[0])
+    frame[1::3] = rotated.translate(palette[1])
+    frame[2::3] = rotated.translate(palette[2])
+
+
+def rainbow_frame(positions: bytes, step: int, frame: bytearray) -> None:
+    palette_frame(positions, step, frame, (WHEEL_R, WHEEL_G, WHEEL_B))
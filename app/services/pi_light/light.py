@@ -1,11 +1,21 @@
-import time
+import os
+import sys
+import threading
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from loguru import logger
 
 from app.core.config import Settings
 from app.core.settings import get_settings
-from app.services.pi_light import rule_manager
-from app.services.pi_light.color import Color
+from app.services.pi_light import animation, frame, rule_manager
+from app.services.pi_light.color import Color, Pixel
+from app.services.pi_light.metrics import Exposition, Histogram
 from app.services.pi_light.mode import Mode
 from app.services.pi_light.state import State
+from app.services.pi_light.status_feed import StatusFeed
+from app.services.pi_light.transition import Transition
+from app.services.pi_light.zone import Zone
 
 if get_settings().environment == "prod":
     import app.services.pi_light.board as board
@@ -17,43 +27,329 @@ class Light:
     _board: board.Board
     _state: State
     _mode: Mode
-    _color: Color
+    # the color set through the API
+    _pixel: Pixel
+    # the whole strip's pixel in rules mode, written by the render thread only
+    _rules_pixel: Pixel
+    # (mode, pixel) published by API threads as a single reference, so the
+    # render thread always reads a consistent pair without taking a lock
+    _target: Tuple[Mode, Pixel]
+    _publish_lock: threading.Lock
+    _wake: threading.Event
+    _renderer: animation.Renderer
+    # frame the layers are composited into, and the layers it holds
+    _frame: bytearray
+    _layers: Optional[List[Tuple[Optional[Zone], Pixel]]]
+    # the target and rule segments the layers were made for, a change fades
+    # while a gradient advancing within the same segments is shown directly
+    _scene: Optional[Tuple[Tuple[Mode, Pixel], Optional[rule_manager.Segments]]]
+    # bumped by every wake, and its value when the layers were last evaluated;
+    # until then or the deadline they change at, refreshes reuse the layers
+    _wakes: int
+    _evaluated: int
+    _deadline: float
+    # frame on the strip and its brightness, None before the first
+    _shown: Optional[Tuple[bytearray, float]]
+    _transition: Optional[Transition]
+    _fade_frame: bytearray
+    # whether the board needs the static frame refreshed to dither it
+    _dithering: bool
+    _thread: Optional[threading.Thread]
     rule_manager: rule_manager.RuleManager
+    status_feed: StatusFeed
+    # render loop timings, written by the render thread only
+    tick_seconds: Histogram
+    rules_seconds: Histogram
+    sleep_drift_seconds: Histogram
 
-    def __init__(self):
+    def __init__(self, settings: Settings = get_settings()):
         self._board = board.Board()
         self._state = State.RUNNING
         self._mode = Mode.DEFAULT
-        self._color = Color()
+        self._pixel = Pixel()
+        self._rules_pixel = Pixel()
+        self._target = (self._mode, self._pixel)
+        self._publish_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._renderer = animation.Renderer(
+            self._board, settings.led_count, settings.fps, settings.default_brightness
+        )
+        self._frame = frame.new_frame(settings.led_count)
+        self._layers = None
+        self._scene = None
+        self._wakes = 0
+        self._evaluated = 0
+        self._deadline = 0.0
+        self._shown = None
+        self._transition = None
+        self._fade_frame = frame.new_frame(settings.led_count)
+        self._dithering = False
         self.rule_manager = rule_manager.RuleManager()
+        self.rule_manager.add_listener(self.wake)
+        self.status_feed = StatusFeed()
+        self.tick_seconds = Histogram()
+        self.rules_seconds = Histogram()
+        self.sleep_drift_seconds = Histogram()
+        self._thread = None
 
     @property
-    def color(self):
-        return self._color
+    def color(self) -> Color:
+        mode, pixel = self._target
+        if mode == Mode.RULES:
+            pixel = self._rules_pixel
+        return pixel.to_color()
 
     @color.setter
-    def color(self, value):
-        self._color = value
+    def color(self, value: Color):
+        pixel = Pixel.from_color(value)
+        with self._publish_lock:
+            self._pixel = pixel
+            self._target = (self._mode, pixel)
+        self.wake()
 
     def state(self):
         return self._state
 
     def set_state(self, state: State):
         self._state = state
+        self.wake()
 
     def mode(self):
         return self._mode
 
     def set_mode(self, mode: Mode):
-        self._mode = mode
+        with self._publish_lock:
+            self._mode = mode
+            self._target = (mode, self._pixel)
+        self.wake()
+
+    def transition_remaining(self) -> Optional[float]:
+        """Seconds left of the cross-fade in progress, None if there is none."""
+        transition = self._transition
+        if transition is None:
+            return None
+        return transition.remaining()
+
+    def wake(self) -> None:
+        self._wakes += 1
+        self._wake.set()
+        self.status_feed.publish()
+
+    def start(self, settings: Settings = get_settings()) -> None:
+        # hand the GIL over sooner so API load delays frames less
+        sys.setswitchinterval(settings.switch_interval_ms / 1000)
+        self.set_state(State.RUNNING)
+        self._thread = threading.Thread(
+            target=self._render, name="render", args=(settings,), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self.set_state(State.STOPPED)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _render(self, settings: Settings) -> None:
+        try:
+            os.setpriority(
+                os.PRIO_PROCESS, threading.get_native_id(), settings.render_nice
+            )
+        except (AttributeError, OSError) as e:
+            logger.info(f"Unable to set render thread priority: {e}")
+        self.run(settings)
 
     def run(self, settings: Settings = get_settings()) -> None:
         while self.state() == State.RUNNING:
-            if self.mode() == Mode.RAINBOW:
-                self._board.rainbow_step()
-                time.sleep(settings.rainbow_sleep_ms / 1000)
+            started = perf_counter()
+            target = self._target
+            mode, pixel = target
+            if mode in animation.ANIMATIONS:
+                self._layers = None
+                self._scene = None
+                self._deadline = 0.0
+                self._end_transition()
+                timeout = self._renderer.render(mode, pixel)
+                self._shown = (self._renderer.frame, self._renderer.brightness)
+                self.tick_seconds.observe(perf_counter() - started)
+                self.wait(timeout)
                 continue
-            if self.mode() == Mode.RULES:
-                self._color = self.rule_manager.current_color()
-            self._board.fill(self.color)
-            time.sleep(settings.sleep_ms / 1000)
+            layers = self._layers
+            if (
+                layers is None
+                or self._evaluated != self._wakes
+                or started >= self._deadline
+            ):
+                layers, timeout = self._evaluate(target, started, settings)
+            else:
+                # nothing changed, a refresh only moves the fade or dither on
+                timeout = self._deadline - started
+            if self._transition is not None:
+                timeout = min(timeout, self._fade(self._transition))
+            elif len(layers) == 1:
+                self._dithering = self._board.fill(layers[0][1])
+            elif self._dithering:
+                self._dithering = self._board.show(self._frame, 1.0)
+            if self._dithering:
+                timeout = min(timeout, 1 / settings.dither_fps)
+            self.tick_seconds.observe(perf_counter() - started)
+            self.wait(timeout)
+
+    def _evaluate(
+        self, target: Tuple[Mode, Pixel], started: float, settings: Settings
+    ) -> Tuple[List[Tuple[Optional[Zone], Pixel]], float]:
+        """
+        The layers to show for target with the seconds until they next change,
+        starting a fade or compositing the frame when they differ from the
+        layers shown.
+        """
+        self._evaluated = self._wakes
+        mode, pixel = target
+        timeout = settings.sleep_ms / 1000
+        layers: List[Tuple[Optional[Zone], Pixel]] = [(None, pixel)]
+        segments = None
+        if mode == Mode.RULES:
+            segments, layers = self.rule_manager.current_segments()
+            pixel = layers[0][1]
+            if pixel is not self._rules_pixel:
+                self._rules_pixel = pixel
+                self.status_feed.publish()
+            timeout = min(timeout, self.rule_manager.next_change())
+            self.rules_seconds.observe(perf_counter() - started)
+        self._deadline = started + timeout
+        if layers != self._layers:
+            scene = (target, segments)
+            self._layers = layers
+            self._change(layers, settings, fade=scene != self._scene)
+            self._scene = scene
+        return layers, timeout
+
+    def _composite(self, layers: List[Tuple[Optional[Zone], Pixel]]) -> None:
+        # zones are painted over the whole strip, later zones over earlier ones
+        for zone, pixel in layers:
+            if zone is None:
+                frame.paint(self._frame, 0, len(self._frame) // 3, pixel)
+            else:
+                frame.paint(self._frame, zone.first, zone.last + 1, pixel)
+
+    def _change(
+        self,
+        layers: List[Tuple[Optional[Zone], Pixel]],
+        settings: Settings,
+        fade: bool,
+    ) -> None:
+        # fade from whatever is on the strip now, mid-transition included;
+        # without a fade, a fade in progress carries on towards the new frame
+        transition = self._transition
+        duration = settings.transition_ms / 1000
+        if not fade:
+            duration = 0.0 if transition is None else transition.remaining()
+        source = None
+        if self._shown is not None and duration > 0:
+            source = frame.dim(*self._shown)
+        self._composite(layers)
+        if source is not None and source != self._frame:
+            self._transition = Transition(
+                source, self._frame, duration, settings.transition_fps
+            )
+            self._shown = (self._fade_frame, 1.0)
+            if transition is None:
+                self.status_feed.publish()
+            return
+        self._end_transition()
+        if len(layers) > 1:
+            self._dithering = self._board.show(self._frame, 1.0)
+        self._shown = (self._frame, 1.0)
+
+    def _fade(self, transition: Transition) -> float:
+        timeout = transition.render(self._fade_frame)
+        self._dithering = self._board.show(self._fade_frame, 1.0)
+        if transition.done:
+            self._end_transition()
+            self._shown = (self._frame, 1.0)
+        return timeout
+
+    def _end_transition(self) -> None:
+        if self._transition is not None:
+            self._transition = None
+            self.status_feed.publish()
+
+    def wait(self, seconds: float) -> None:
+        # returns early when woken by a state, mode, color or rule change
+        started = perf_counter()
+        if not self._wake.wait(seconds):
+            overslept = perf_counter() - started - seconds
+            self.sleep_drift_seconds.observe(max(overslept, 0.0))
+        self._wake.clear()
+
+    def collect_metrics(self, metrics: Exposition) -> None:
+        metrics.histogram(
+            "pi_light_tick_seconds",
+            "Time the render loop spent per iteration, excluding sleep.",
+            self.tick_seconds,
+        )
+        metrics.histogram(
+            "pi_light_rules_lookup_seconds",
+            "Time spent finding the current rules in rules mode.",
+            self.rules_seconds,
+        )
+        metrics.histogram(
+            "pi_light_sleep_drift_seconds",
+            "Time the render loop slept past its deadline.",
+            self.sleep_drift_seconds,
+        )
+        metrics.histogram(
+            "pi_light_board_write_seconds",
+            "Time spent encoding and writing a frame to the strip.",
+            self._board.write_seconds,
+        )
+        metrics.counter(
+            "pi_light_board_writes_total",
+            "Frames written to the strip.",
+            self._board.writes,
+        )
+        metrics.counter(
+            "pi_light_board_skipped_writes_total",
+            "Fills skipped because the strip already showed them.",
+            self._board.skipped_writes,
+        )
+        metrics.counter(
+            "pi_light_animation_frames_total",
+            "Animation frames rendered.",
+            self._renderer.frames,
+        )
+        metrics.counter(
+            "pi_light_animation_dropped_frames_total",
+            "Animation frames dropped because rendering overran.",
+            self._renderer.dropped_frames,
+        )
+        metrics.gauge(
+            "pi_light_dithering",
+            "Whether the strip is refreshed to dither a static frame.",
+            int(self._dithering),
+        )
+        metrics.gauge(
+            "pi_light_transition_remaining_seconds",
+            "Seconds left of the cross-fade in progress.",
+            self.transition_remaining() or 0.0,
+        )
+        rule_set = self.rule_manager.rule_set
+        metrics.gauge(
+            "pi_light_rules",
+            "Rules across every day and zone.",
+            sum(
+                len(rules)
+                for layer in rule_set.layers.values()
+                for rules in layer.rules.values()
+            ),
+        )
+        metrics.gauge(
+            "pi_light_rules_version",
+            "Version of the published rules, bumped on every change.",
+            rule_set.version,
+        )
+        metrics.gauge(
+            "pi_light_stream_subscribers",
+            "Clients of the status stream.",
+            len(self.status_feed),
+        )
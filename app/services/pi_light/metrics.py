@@ -0,0 +1,76 @@
+from bisect import bisect_left
+from typing import List, Sequence
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from a fast tick up to a slow SPI write or a badly overrun sleep
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+)
+
+
+class Histogram:
+    """
+    Counts observations per bucket. Observing is a bisect and two additions,
+    cheap enough for the render loop; it is written by a single thread and
+    only read elsewhere. Counts are cumulative as Prometheus expects, rates
+    over a window are left to the scraper.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # the last count is for observations above every bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Exposition:
+    """Metrics in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lines: List[str] = []
+
+    def _header(self, name: str, kind: str, description: str) -> None:
+        self._lines.append(f"# HELP {name} {description}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def counter(self, name: str, description: str, value: float) -> None:
+        self._header(name, "counter", description)
+        self._lines.append(f"{name} {value}")
+
+    def gauge(self, name: str, description: str, value: float) -> None:
+        self._header(name, "gauge", description)
+        self._lines.append(f"{name} {value}")
+
+    def histogram(self, name: str, description: str, histogram: Histogram) -> None:
+        self._header(name, "histogram", description)
+        counts, total = list(histogram.counts), histogram.sum
+        cumulative = 0
+        for bucket, count in zip(histogram.buckets, counts):
+            cumulative += count
+            self._lines.append(f'{name}_bucket{{le="{bucket}"}} {cumulative}')
+        cumulative += counts[-1]
+        self._lines.append(f'{name}_bucket{{le="+Inf"}} {cumulative}')
+        self._lines.append(f"{name}_sum {total}")
+        self._lines.append(f"{name}_count {cumulative}")
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -5,3 +5,7 @@ class Mode(str, Enum):
     DEFAULT = "Default"
     RULES = "Rules"
     RAINBOW = "Rainbow"
+    BREATHE = "Breathe"
+    CHASE = "Chase"
+    TWINKLE = "Twinkle"
+    GRADIENT_SWEEP = "Gradient Sweep"
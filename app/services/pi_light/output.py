@@ -0,0 +1,91 @@
+from functools import lru_cache
+from typing import Tuple, Union
+
+from app.core.settings import get_settings
+
+
+def brightness_scale(brightness: float) -> float:
+    """
+    Factor applying brightness to a frame's values before gamma correction,
+    so a frame shown at brightness 1.0 looks like the same frame shown at
+    brightness.
+    """
+    return brightness ** (1 / get_settings().gamma)
+
+
+def _thresholds(phases: int) -> Tuple[float, ...]:
+    # bit reversed, so consecutive phases and pixels are spread out
+    bits = phases.bit_length() - 1
+    return tuple(
+        (int(f"{phase:0{bits}b}"[::-1] or "0", 2) + 0.5) / phases
+        for phase in range(phases)
+    )
+
+
+@lru_cache(maxsize=8)
+def _tables(
+    gamma: float, phases: int, brightness: float, limit: float
+) -> Tuple[Tuple[bytes, ...], bytes]:
+    """
+    A bytes.translate table per dither phase, mapping a value to its gamma
+    corrected output at brightness rounded up or down so that the phases
+    average to the exact output, and the values that are the same in every
+    phase. Outputs from limit up are rounded to the nearest level instead,
+    a single step is too small a change to see there.
+    """
+    levels = [255 * (value / 255) ** gamma * brightness for value in range(256)]
+    tables = tuple(
+        bytes(
+            min(int(level + 1 - (threshold if level < limit else 0.5)), 255)
+            for level in levels
+        )
+        for threshold in _thresholds(phases)
+    )
+    steady = bytes(
+        value for value in range(256) if len({table[value] for table in tables}) == 1
+    )
+    return tables, steady
+
+
+class Output:
+    """
+    Encodes RGB frames for the strip with gamma correction and brightness
+    applied through lookup tables, which are only rebuilt when the
+    brightness changes. Outputs below dither_limit that fall between two
+    levels are dithered over successive frames, with neighbouring pixels in
+    different phases, so low brightness gets more than a handful of steps as
+    long as the strip is refreshed often.
+    """
+
+    def __init__(
+        self,
+        led_count: int,
+        gamma: float,
+        dither_bits: int,
+        bpp: int = 3,
+        byteorder: str = "RGB",
+        dither_limit: float = 32,
+    ):
+        self.gamma = gamma
+        self.phases = 1 << dither_bits
+        self.dither_limit = dither_limit
+        self.bpp = bpp
+        self.offsets = tuple(byteorder.index(name) for name in "RGB")
+        self.buffer = bytearray(bpp * led_count)
+        self.phase = 0
+        # whether the last frame encoded needs refreshing to dither
+        self.dithering = False
+
+    def encode(self, frame: Union[bytes, bytearray], brightness: float) -> bytearray:
+        """The strip's buffer for frame's next dither phase."""
+        tables, steady = _tables(self.gamma, self.phases, brightness, self.dither_limit)
+        phases, bpp, buffer = self.phases, self.bpp, self.buffer
+        for channel, offset in enumerate(self.offsets):
+            for group in range(phases):
+                table = tables[(self.phase + group) % phases]
+                buffer[offset + group * bpp :: phases * bpp] = frame[
+                    channel + 3 * group :: 3 * phases
+                ].translate(table)
+        self.phase = (self.phase + 1) % phases
+        self.dithering = bool(frame.translate(None, steady))
+        return buffer
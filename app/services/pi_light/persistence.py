@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+from app.services.pi_light.metrics import Exposition
+from app.services.pi_light.rule_manager import RuleManager
+
+
+class RulePersister:
+    """
+    Write-behind persistence of a RuleManager's rules to a snapshot. The
+    first change after a flush schedules the next flush delay seconds later,
+    so a burst of changes is written once, saving wear on the SD card.
+    """
+
+    def __init__(self, rule_manager: RuleManager, path: str, delay: float):
+        self.rule_manager = rule_manager
+        self.path = path
+        self.delay = delay
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self._dirty = False
+        self._running = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        # held while writing, so stop waits for a flush in progress
+        self._flush_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self.rule_manager.add_listener(self.mark_dirty)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._running = False
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+    def mark_dirty(self) -> None:
+        with self._lock:
+            self._dirty = True
+            if self._running and self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.name = "persist"
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+            started = time.perf_counter()
+            try:
+                self.rule_manager.save_snapshot(self.path)
+            except OSError as e:
+                self.failed_flushes += 1
+                logger.warning(f"Unable to save rules snapshot: {e}")
+                # retried on the next flush
+                self.mark_dirty()
+                return
+            self.flushes += 1
+            self.last_flush_seconds = time.perf_counter() - started
+            logger.debug(
+                f"Saved rules snapshot in {self.last_flush_seconds * 1000:.1f}ms"
+            )
+
+    def collect_metrics(self, metrics: Exposition) -> None:
+        metrics.counter(
+            "pi_light_snapshot_flushes_total",
+            "Rule snapshots saved.",
+            self.flushes,
+        )
+        metrics.counter(
+            "pi_light_snapshot_failed_flushes_total",
+            "Rule snapshots that failed to save.",
+            self.failed_flushes,
+        )
+        metrics.gauge(
+            "pi_light_snapshot_last_flush_seconds",
+            "Time taken to save the last rule snapshot.",
+            self.last_flush_seconds,
+        )
@@ -7,7 +7,8 @@ from pydantic import BaseModel, Extra, validator
 
 from app.services.pi_light.color import Color
 from app.services.pi_light.day import Day
-from app.services.simple_time import SimpleTime
+from app.services.pi_light.zone import Zone
+from app.services.simple_time import DaySeconds, to_seconds, to_time
 
 
 class OverlapRegion(IntEnum):
@@ -21,6 +22,8 @@ class Rule(BaseModel):
     stop_time: time = time(hour=23, minute=59, second=59)
     start_color: Color = Color()
     stop_color: Color = Color()
+    # pixels the rule applies to, the whole strip when None
+    zone: Optional[Zone] = None
 
     class Config:
         frozen = True
@@ -40,13 +43,21 @@ class Rule(BaseModel):
     def hash(self):
         return self.__hash__()
 
+    @property
+    def start_seconds(self) -> DaySeconds:
+        return to_seconds(self.start_time)
+
+    @property
+    def stop_seconds(self) -> DaySeconds:
+        return to_seconds(self.stop_time)
+
     def within(self, rule) -> bool:
-        if self.day != rule.day:
+        if self.day != rule.day or self.zone != rule.zone:
             return False
         return self.start_time >= rule.start_time and self.stop_time <= rule.stop_time
 
     def overlaps(self, rule, overlap_region: Optional[OverlapRegion] = None) -> bool:
-        if self.day != rule.day:
+        if self.day != rule.day or self.zone != rule.zone:
             return False
         if overlap_region == OverlapRegion.HEAD:
             return self.start_time < rule.start_time <= self.stop_time
@@ -66,12 +77,12 @@ class Rule(BaseModel):
 
     @staticmethod
     def random():
-        start_time = randint(0, 86400)  # nosec
-        stop_time = randint(start_time, 86400)  # nosec
+        start_time = randint(0, 86398)  # nosec
+        stop_time = randint(start_time + 1, 86399)  # nosec
         return Rule(
             day=choice(list(Day)),  # nosec
-            start_time=SimpleTime.from_seconds(start_time).time(),
-            stop_time=SimpleTime.from_seconds(stop_time).time(),
+            start_time=to_time(start_time),
+            stop_time=to_time(stop_time),
             start_color=Color.random(),  # nosec
             stop_color=Color.random(),  # nosec
         )
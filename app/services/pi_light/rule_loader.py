@@ -0,0 +1,133 @@
+import json
+import time
+from datetime import time as dt_time
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Tuple, Union
+
+from pydantic import ValidationError
+from pydantic.datetime_parse import parse_time
+
+from app.services.pi_light.color import Color
+from app.services.pi_light.rule import Rule
+
+loads: Callable[[Union[bytes, str]], Any]
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+JSON_LINES_SUFFIXES = (".jsonl", ".ndjson")
+
+
+class RecordError(NamedTuple):
+    record: str
+    error: str
+
+
+class LoadReport(NamedTuple):
+    loaded: int
+    errors: List[RecordError]
+    parse_seconds: float
+    build_seconds: float = 0.0
+
+
+def read_records(rule_file: str) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (record name, record) for every rule in a rule file. JSON Lines
+    files are streamed and yield undecoded lines, so a bad line only fails
+    its own record. Day-keyed files are decoded whole.
+    """
+    with open(rule_file, "rb") as f:
+        if rule_file.endswith(JSON_LINES_SUFFIXES):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"line {number}", line
+            return
+        data = loads(f.read())
+    for day, rules in data.items():
+        for index, rule in enumerate(rules):
+            if isinstance(rule, dict):
+                rule.setdefault("day", day)
+            yield f"{day}[{index}]", rule
+
+
+def _describe(e: Exception) -> str:
+    if isinstance(e, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            for error in e.errors()
+        )
+    return str(e)
+
+
+class RuleValidator:
+    """
+    Validates rule records, reusing the colors and times already validated
+    for earlier records since generated schedules repeat them heavily.
+    Values that fail here are left for Rule to report.
+    """
+
+    def __init__(self):
+        self._colors: Dict[Tuple, Color] = {}
+        self._times: Dict[Any, dt_time] = {}
+
+    def _color(self, value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        try:
+            key = tuple(value.items())
+            return self._colors[key]
+        except TypeError:
+            return value
+        except KeyError:
+            pass
+        try:
+            color = self._colors[key] = Color.parse_obj(value)
+        except ValidationError:
+            return value
+        return color
+
+    def _time(self, value: Any) -> Any:
+        try:
+            return self._times[value]
+        except TypeError:
+            return value
+        except KeyError:
+            pass
+        try:
+            parsed = self._times[value] = parse_time(value)
+        except (TypeError, ValueError):
+            return value
+        return parsed
+
+    def rule(self, record: Any) -> Rule:
+        if isinstance(record, (bytes, str)):
+            record = loads(record)
+        if not isinstance(record, dict):
+            raise ValueError("rule is not a JSON object")
+        record = dict(record)
+        for key in ("start_color", "stop_color"):
+            if key in record:
+                record[key] = self._color(record[key])
+        for key in ("start_time", "stop_time"):
+            if key in record:
+                record[key] = self._time(record[key])
+        return Rule.parse_obj(record)
+
+
+def load_rule_file(rule_file: str) -> Tuple[List[Rule], LoadReport]:
+    """
+    Read and validate every rule of a JSON Lines or day-keyed rule file.
+    Invalid records are reported instead of failing the whole file.
+    """
+    started = time.perf_counter()
+    rules: List[Rule] = []
+    errors: List[RecordError] = []
+    validator = RuleValidator()
+    for name, record in read_records(rule_file):
+        try:
+            rules.append(validator.rule(record))
+        except (ValidationError, ValueError) as e:
+            errors.append(RecordError(name, _describe(e)))
+    return rules, LoadReport(len(rules), errors, time.perf_counter() - started)
@@ -1,199 +1,457 @@
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time, timedelta
+from heapq import heappop, heappush
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 
 from loguru import logger
 
-from app.services.pi_light.color import Color
+from app.services.pi_light import snapshot
+from app.services.pi_light.color import Color, Pixel
 from app.services.pi_light.day import Day
-from app.services.pi_light.rule import OverlapRegion, Rule
-from app.services.simple_time import SimpleTime
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.rule_loader import LoadReport, load_rule_file
+from app.services.pi_light.schedule import BLACK, DaySchedule
+from app.services.pi_light.zone import Zone
+from app.services.simple_time import to_time
+
+DAYS = list(Day)
 
 
 class RuleDoesNotExistError(Exception):
     pass
 
 
-class RuleManager:
+def _now() -> Tuple[Day, float]:
+    dt_now = datetime.now()
+    now = (
+        dt_now.hour * 3600
+        + dt_now.minute * 60
+        + dt_now.second
+        + dt_now.microsecond / 1_000_000
+    )
+    return DAYS[dt_now.weekday()], now
+
+
+def _trim(rule: Rule, start: int, stop: int) -> Rule:
+    if start == rule.start_seconds and stop == rule.stop_seconds:
+        return rule
+    return Rule(
+        day=rule.day,
+        start_time=to_time(start),
+        stop_time=to_time(stop),
+        start_color=rule.start_color,
+        stop_color=rule.stop_color,
+        zone=rule.zone,
+    )
+
+
+def _overlay(rules: List[Rule]) -> List[Rule]:
+    """
+    Resolve overlaps between a day's rules in one sweep, with the same result
+    as adding them one by one with add_rule: later rules win and the parts of
+    earlier rules they do not cover are kept.
+    """
+    starting: Dict[int, List[int]] = {}
+    bounds: Set[int] = set()
+    for priority, rule in enumerate(rules):
+        starting.setdefault(rule.start_seconds, []).append(priority)
+        bounds.add(rule.start_seconds)
+        bounds.add(rule.stop_seconds + 1)
+    edges = sorted(bounds)
+    # max-heap of the priorities of the rules covering the current interval
+    covering: List[int] = []
+    pieces: List[List[int]] = []
+    for left, right in zip(edges, edges[1:]):
+        for priority in starting.get(left, ()):
+            heappush(covering, -priority)
+        while covering and rules[-covering[0]].stop_seconds < left:
+            heappop(covering)
+        if not covering:
+            continue
+        owner = -covering[0]
+        if pieces and pieces[-1][0] == owner and pieces[-1][2] == left - 1:
+            pieces[-1][2] = right - 1
+        else:
+            pieces.append([owner, left, right - 1])
+    # rules need at least two seconds, single seconds left over are dropped
+    return [
+        _trim(rules[owner], start, stop)
+        for owner, start, stop in pieces
+        if start < stop
+    ]
+
+
+def _encode(value: object) -> str:
+    if isinstance(value, time):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class Layer(NamedTuple):
+    """The rules of one zone, or of the whole strip, with their schedules."""
+
     rules: Dict[Day, List[Rule]]
+    schedules: Dict[Day, DaySchedule]
+
+
+def _empty_layer() -> Layer:
+    return Layer({day: [] for day in Day}, {day: DaySchedule() for day in Day})
+
+
+def _layer_order(zone: Optional[Zone]) -> Tuple[int, int]:
+    return (-1, -1) if zone is None else (zone.first, zone.last)
+
+
+# a zone's, or the whole strip's (None), rules for one day
+Timeline = Tuple[Optional[Zone], Day]
+
+
+# the rule set's version, the day and the start of each layer's active
+# segment, which stays the same while gradients advance within the segments
+Segments = Tuple[int, Day, Tuple[Tuple[Optional[Zone], int], ...]]
+
+
+class RuleSet(NamedTuple):
+    """
+    One version of all rules with their compiled schedules. The whole strip's
+    layer is under None, followed by the zone layers in the order they are
+    painted over it. Published rule sets are never modified, changes publish
+    a new one.
+    """
+
+    version: int
+    layers: Dict[Optional[Zone], Layer]
+
+    @property
+    def rules(self) -> Dict[Day, List[Rule]]:
+        """The whole strip's rules."""
+        return self.layers[None].rules
+
+    @property
+    def schedules(self) -> Dict[Day, DaySchedule]:
+        return self.layers[None].schedules
+
+    def layer(self, zone: Optional[Zone]) -> Layer:
+        return self.layers.get(zone) or _empty_layer()
+
+    def all_rules(self) -> Dict[Day, List[Rule]]:
+        """Every day's rules, the whole strip's followed by each zone's."""
+        return {
+            day: [rule for layer in self.layers.values() for rule in layer.rules[day]]
+            for day in Day
+        }
+
+
+class RuleManager:
+    # the current rule set, replaced as a whole so readers never see a change
+    # half applied and need no lock
+    rule_set: RuleSet
+    # every rule by hash, a rule's position is found by bisecting its start
+    _by_hash: Dict[int, Rule]
+    # serializes changes
+    _lock: threading.RLock
+    # (version, etag, body) of the last serialized rules
+    _json: Tuple[int, str, bytes]
+    _listeners: List[Callable[[], None]]
 
     def __init__(self):
-        self.rules = {day: [] for day in Day}
+        self.rule_set = RuleSet(0, {None: _empty_layer()})
+        self._by_hash = {}
+        self._lock = threading.RLock()
+        self._json = (-1, "", b"")
+        self._listeners = []
+
+    @property
+    def rules(self) -> Dict[Day, List[Rule]]:
+        return self.rule_set.rules
+
+    @property
+    def version(self) -> int:
+        return self.rule_set.version
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    def _publish(
+        self,
+        changes: Dict[Timeline, Tuple[List[Rule], DaySchedule]],
+        replace: bool = False,
+    ) -> None:
+        """
+        Publish a new rule set with the given timelines changed, or with only
+        them when replacing. Called under the lock.
+        """
+        current = self.rule_set
+        layers: Dict[Optional[Zone], Layer] = (
+            {None: _empty_layer()} if replace else dict(current.layers)
+        )
+        for (zone, day), (rules, schedule) in changes.items():
+            layer = layers.get(zone) or _empty_layer()
+            layers[zone] = Layer(
+                {**layer.rules, day: rules}, {**layer.schedules, day: schedule}
+            )
+        self.rule_set = RuleSet(
+            current.version + 1,
+            {
+                zone: layers[zone]
+                for zone in sorted(layers, key=_layer_order)
+                if zone is None or any(layers[zone].rules.values())
+            },
+        )
+
+    def _changed(self) -> None:
+        for listener in self._listeners:
+            listener()
+
+    def _reindex(self, removed: Iterable[Rule], added: Iterable[Rule]) -> None:
+        for rule in removed:
+            self._by_hash.pop(hash(rule), None)
+        for rule in added:
+            self._by_hash[hash(rule)] = rule
+
+    def _position(self, rule: Rule) -> int:
+        layer = self.rule_set.layer(rule.zone)
+        index = bisect_left(layer.schedules[rule.day].starts, rule.start_seconds)
+        rules = layer.rules[rule.day]
+        if index == len(rules) or rules[index] != rule:
+            raise RuleDoesNotExistError()
+        return index
 
     def add_rule(self, rule: Rule) -> None:
-        rules = self.rules[rule.day]
-        if not rules or rule.start_time > rules[-1].stop_time:
-            return rules.append(rule)
-        if rule.stop_time < rules[0].start_time:
-            return rules.insert(0, rule)
+        with self._lock:
+            layer = self.rule_set.layer(rule.zone)
+            rules = list(layer.rules[rule.day])
+            schedule = layer.schedules[rule.day].copy()
+            self._insert(rule, rules, schedule)
+            self._publish({(rule.zone, rule.day): (rules, schedule)})
+        self._changed()
 
-        # Add in sorted order
+    def _insert(self, rule: Rule, rules: List[Rule], schedule: DaySchedule) -> None:
+        start, stop = rule.start_seconds, rule.stop_seconds
+        # rules are sorted and disjoint, so the ones overlapping the new rule
+        # are a contiguous window: stopping at or after its start, and
+        # starting at or before its stop
+        lo = bisect_left(schedule.stops, start)
+        hi = bisect_right(schedule.starts, stop, lo)
         new_rules = []
-        rule_added = False
-        for r in rules:
-            # existing rule is within new rule
-            if r.within(rule):
-                continue
-            # new rule is within existing rule
-            elif rule.within(r):
-                new_head = Rule(
-                    day=rule.day,
-                    start_time=r.start_time,
-                    stop_time=(SimpleTime.from_time(rule.start_time) - 1).time(),
-                    start_color=r.start_color,
-                    stop_color=r.stop_color,
-                )
-                new_rules.append(new_head)
-                new_rules.append(rule)
-                new_tail = Rule(
-                    day=rule.day,
-                    start_time=(SimpleTime.from_time(rule.stop_time) + 1).time(),
-                    stop_time=r.stop_time,
-                    start_color=r.start_color,
-                    stop_color=r.stop_color,
-                )
-                new_rules.append(new_tail)
-                rule_added = True
-                continue
-            # new rule is before existing rule
-            elif not rule_added and rule.stop_time < r.start_time:
-                new_rules.append(rule)
-                new_rules.append(r)
-                rule_added = True
-                continue
-            # new rule overlaps head of existing rule
-            elif rule.overlaps(r, OverlapRegion.HEAD):
-                if not rule_added:
-                    new_rules.append(rule)
-                    rule_added = True
-                new_rule = Rule(
-                    day=rule.day,
-                    start_time=(SimpleTime.from_time(rule.stop_time) + 1).time(),
-                    stop_time=r.stop_time,
-                    start_color=r.start_color,
-                    stop_color=r.stop_color,
-                )
-                new_rules.append(new_rule)
-                continue
-            # new rule overlaps tail of existing rule
-            elif rule.overlaps(r, OverlapRegion.TAIL):
-                new_rule = Rule(
-                    day=rule.day,
-                    start_time=r.start_time,
-                    stop_time=(SimpleTime.from_time(rule.start_time) - 1).time(),
-                    start_color=r.start_color,
-                    stop_color=r.stop_color,
-                )
-                new_rules.append(new_rule)
-                if not rule_added:
-                    new_rules.append(rule)
-                    rule_added = True
-                continue
-            new_rules.append(r)
-        if not rule_added:
-            new_rules.append(rule)
-        self.rules[rule.day] = new_rules
+        # keep the parts of the overlapped rules outside the new rule, rules
+        # need at least two seconds so a single second left over is dropped
+        if lo < hi and rules[lo].start_seconds < start - 1:
+            new_rules.append(_trim(rules[lo], rules[lo].start_seconds, start - 1))
+        new_rules.append(rule)
+        if lo < hi and rules[hi - 1].stop_seconds > stop + 1:
+            new_rules.append(_trim(rules[hi - 1], stop + 1, rules[hi - 1].stop_seconds))
+        self._reindex(rules[lo:hi], new_rules)
+        rules[lo:hi] = new_rules
+        schedule.splice(lo, hi, new_rules)
+
+    def add_rules(self, rules: Iterable[Rule]) -> None:
+        by_timeline: Dict[Timeline, List[Rule]] = {}
+        for rule in rules:
+            by_timeline.setdefault((rule.zone, rule.day), []).append(rule)
+        with self._lock:
+            changes = {}
+            for (zone, day), timeline_rules in by_timeline.items():
+                current = self.rule_set.layer(zone).rules[day]
+                overlaid = _overlay(current + timeline_rules)
+                self._reindex(current, overlaid)
+                changes[(zone, day)] = (overlaid, DaySchedule(overlaid))
+            self._publish(changes)
+        self._changed()
 
     def remove_rule(self, rule: Rule) -> None:
-        if rule not in self.rules[rule.day]:
-            raise RuleDoesNotExistError()
-        self.rules[rule.day].remove(rule)
+        with self._lock:
+            index = self._position(rule)
+            self._reindex([rule], [])
+            layer = self.rule_set.layer(rule.zone)
+            rules = list(layer.rules[rule.day])
+            del rules[index]
+            schedule = layer.schedules[rule.day].copy()
+            schedule.splice(index, index + 1, [])
+            self._publish({(rule.zone, rule.day): (rules, schedule)})
+        self._changed()
 
     def remove_rule_by_hash(self, rule_hash: int) -> None:
-        for day, rules in self.rules.items():
-            hashed_day_rules = list(map(hash, rules))
-            try:
-                rule_ix = hashed_day_rules.index(rule_hash)
-            except ValueError:
-                continue
-            return self.remove_rule(rules[rule_ix])
-        raise RuleDoesNotExistError()
+        rule = self._by_hash.get(rule_hash)
+        if rule is None:
+            raise RuleDoesNotExistError()
+        self.remove_rule(rule)
 
-    def current_rule(self) -> Tuple[Optional[Rule], float]:
-        dt_now = datetime.now()
-        day = Day(dt_now.strftime("%A"))
-        for r in self.rules[day]:
-            now = dt_now.time()
-            if r.start_time <= now <= r.stop_time:
-                st_now = SimpleTime.from_time(now)
-                start = SimpleTime.from_time(r.start_time)
-                stop = SimpleTime.from_time(r.stop_time)
-                percentage = (st_now.total_seconds() - start.total_seconds()) / (
-                    stop.total_seconds() - start.total_seconds()
+    def remove_rules_by_hash(self, rule_hashes: Iterable[int]) -> List[int]:
+        """
+        Remove the rules with the given hashes, recompiling each affected day
+        once. Returns the hashes that did not match any rule.
+        """
+        missing = []
+        positions: Dict[Timeline, Set[int]] = {}
+        with self._lock:
+            for rule_hash in rule_hashes:
+                rule = self._by_hash.get(rule_hash)
+                if rule is None:
+                    missing.append(rule_hash)
+                    continue
+                positions.setdefault((rule.zone, rule.day), set()).add(
+                    self._position(rule)
                 )
-                return r, percentage
-        return None, 0.0
+            if not positions:
+                return missing
+            changes = {}
+            for (zone, day), removed in positions.items():
+                rules = self.rule_set.layer(zone).rules[day]
+                self._reindex([rules[index] for index in removed], [])
+                kept = [
+                    rule for index, rule in enumerate(rules) if index not in removed
+                ]
+                changes[(zone, day)] = (kept, DaySchedule(kept))
+            self._publish(changes)
+        self._changed()
+        return missing
+
+    def rules_json(self) -> Tuple[str, bytes]:
+        """
+        All rules serialized as JSON, with an ETag for them. Both are cached
+        until the rules change.
+        """
+        version, etag, body = self._json
+        rule_set = self.rule_set
+        if version == rule_set.version:
+            return etag, body
+        body = json.dumps(
+            {
+                day.value: [rule.dict() for rule in rules]
+                for day, rules in rule_set.all_rules().items()
+            },
+            default=_encode,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._json = (rule_set.version, etag, body)
+        return etag, body
+
+    def current_rule(self) -> Tuple[Optional[Rule], float]:
+        day, now = _now()
+        rule_set = self.rule_set
+        schedule = rule_set.schedules[day]
+        index = schedule.find(now)
+        if index < 0:
+            return None, 0.0
+        return rule_set.rules[day][index], schedule.percentage(index, now)
 
     def next_rule(self) -> Tuple[Optional[Rule], timedelta]:
-        dt_now = datetime.now()
-        day = Day(dt_now.strftime("%A"))
-        for index, r in enumerate(self.rules[day]):
-            now = dt_now.time()
-            st_now = SimpleTime.from_time(now)
-            start = SimpleTime.from_time(r.start_time)
-            stop = SimpleTime.from_time(r.stop_time)
-            # if before first rule
-            if now < r.start_time:
-                return r, timedelta(
-                    seconds=start.total_seconds() - st_now.total_seconds()
-                )
-            # if checking last rule
-            if index + 1 == len(self.rules[day]):
-                if r.start_time <= now <= r.stop_time:
-                    return (
-                        None,
-                        timedelta(
-                            seconds=stop.total_seconds() - st_now.total_seconds()
-                        ),
-                    )
-                return None, timedelta(days=1)
-            next_rule = self.rules[day][index + 1]
-            if now > next_rule.start_time:
-                continue
-            # if in a rule
-            if r.start_time <= now <= r.stop_time:
-                # if next rule is immediate, return it
-                if (
-                    SimpleTime.from_time(r.stop_time) + 1
-                ).time() == next_rule.start_time:
-                    return (
-                        next_rule,
-                        timedelta(
-                            seconds=stop.total_seconds() - st_now.total_seconds()
-                        ),
-                    )
-                # if next rule is not immediate, return None
-                else:
-                    return (
-                        None,
-                        timedelta(
-                            seconds=stop.total_seconds() - st_now.total_seconds()
-                        ),
-                    )
-            else:
-                next_start = SimpleTime.from_time(next_rule.start_time)
-                return (
-                    next_rule,
-                    timedelta(
-                        seconds=next_start.total_seconds() - st_now.total_seconds()
-                    ),
-                )
-        return None, timedelta(days=1)
+        day, now = _now()
+        rule_set = self.rule_set
+        rules = rule_set.rules[day]
+        starts, stops = rule_set.schedules[day].starts, rule_set.schedules[day].stops
+        if not rules:
+            return None, timedelta(days=1)
+        st_now = int(now)
+        # last rule starting strictly before now, or the first rule
+        index = max(bisect_left(starts, now) - 1, 0)
+        # if before first rule
+        if now < starts[index]:
+            return rules[index], timedelta(seconds=starts[index] - st_now)
+        in_rule = now <= stops[index]
+        # if checking last rule
+        if index + 1 == len(rules):
+            if in_rule:
+                return None, timedelta(seconds=stops[index] - st_now)
+            return None, timedelta(days=1)
+        # if in a rule, the next rule is only returned if it is immediate
+        if in_rule:
+            if stops[index] + 1 == starts[index + 1]:
+                return rules[index + 1], timedelta(seconds=stops[index] - st_now)
+            return None, timedelta(seconds=stops[index] - st_now)
+        return rules[index + 1], timedelta(seconds=starts[index + 1] - st_now)
 
     def current_color(self) -> Color:
-        current_rule, percentage = self.current_rule()
-        if not current_rule:
-            return Color()
-        return Color.gradient(
-            current_rule.start_color, current_rule.stop_color, percentage
+        return self.current_pixel().to_color()
+
+    def current_pixel(self) -> Pixel:
+        day, now = _now()
+        return self.rule_set.schedules[day].pixel_at(now)
+
+    def current_layers(self) -> List[Tuple[Optional[Zone], Pixel]]:
+        """
+        The whole strip's pixel now, followed by the zones with an active
+        rule. Zones without one show the whole strip's pixel.
+        """
+        return self.current_segments()[1]
+
+    def current_segments(
+        self,
+    ) -> Tuple[Segments, List[Tuple[Optional[Zone], Pixel]]]:
+        """
+        The segments active now with the current layers, both from the same
+        moment so a change of segment is never paired with the other's pixels.
+        """
+        day, now = _now()
+        rule_set = self.rule_set
+        segments = []
+        current: List[Tuple[Optional[Zone], Pixel]] = []
+        for zone, layer in rule_set.layers.items():
+            schedule = layer.schedules[day]
+            index = schedule.find(now)
+            if index >= 0:
+                segments.append((zone, schedule.starts[index]))
+                current.append((zone, schedule.segment_pixel(index, now)))
+            elif zone is None:
+                current.append((zone, BLACK))
+        return (rule_set.version, day, tuple(segments)), current
+
+    def next_change(self) -> float:
+        day, now = _now()
+        return min(
+            layer.schedules[day].next_change(now)
+            for layer in self.rule_set.layers.values()
         )
 
-    def load_rules(self, rule_file: str) -> None:
+    def load_rules(self, rule_file: str) -> Optional[LoadReport]:
         try:
-            with open(rule_file, "r") as f:
-                data = json.load(f)
-                for day, rules in data.items():
-                    for rule in rules:
-                        self.rules[day].append(Rule.parse_obj(rule))
+            rules, report = load_rule_file(rule_file)
         except Exception as e:
             logger.info(f"Unable to load rules file: {e}")
+            return None
+        for error in report.errors:
+            logger.warning(
+                f"Skipping rule {error.record} in {rule_file}: {error.error}"
+            )
+        started = perf_counter()
+        self.add_rules(rules)
+        report = report._replace(build_seconds=perf_counter() - started)
+        logger.info(
+            f"Loaded {report.loaded} rules from {rule_file} "
+            f"({len(report.errors)} skipped) in {report.parse_seconds:.3f}s, "
+            f"built schedules in {report.build_seconds:.3f}s"
+        )
+        return report
+
+    def save_snapshot(self, path: str) -> None:
+        snapshot.save(
+            path,
+            {zone: layer.schedules for zone, layer in self.rule_set.layers.items()},
+        )
+
+    def load_snapshot(self, path: str) -> bool:
+        """Replace all rules with a saved snapshot, returns whether it loaded."""
+        try:
+            layers = snapshot.load(path)
+        except (OSError, snapshot.SnapshotError) as e:
+            logger.info(f"Unable to load rules snapshot: {e}")
+            return False
+        changes = {
+            (zone, day): (snapshot.rules(day, schedule, zone), schedule)
+            for zone, schedules in layers.items()
+            for day, schedule in schedules.items()
+        }
+        with self._lock:
+            self._by_hash = {}
+            for rules, _ in changes.values():
+                self._reindex([], rules)
+            self._publish(changes, replace=True)
+        self._changed()
+        return True
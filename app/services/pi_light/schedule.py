@@ -0,0 +1,160 @@
+from array import array
+from bisect import bisect_right
+from math import ceil, floor
+from typing import Iterable, Optional, Tuple
+
+from app.services.pi_light.color import Color, Pixel
+from app.services.pi_light.rule import Rule
+from app.services.simple_time import DAY_SECONDS
+
+BLACK = Pixel()
+ARRAYS = (
+    "starts",
+    "stops",
+    "start_rgb",
+    "stop_rgb",
+    "start_brightness",
+    "stop_brightness",
+)
+
+
+def pack_rgb(color: Color) -> int:
+    return color.r << 16 | color.g << 8 | color.b
+
+
+def unpack_rgb(rgb: int) -> Tuple[int, int, int]:
+    return rgb >> 16 & 0xFF, rgb >> 8 & 0xFF, rgb & 0xFF
+
+
+class DaySchedule:
+    """
+    A day's rules compiled into parallel arrays of start/stop second offsets,
+    packed start/stop RGB values and start/stop brightnesses. Pixels are
+    evaluated from these arrays without touching the pydantic models. Item
+    sizes are the same on every platform so snapshots load straight into them.
+    """
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.starts = array("i")
+        self.stops = array("i")
+        self.start_rgb = array("I")
+        self.stop_rgb = array("I")
+        self.start_brightness = array("d")
+        self.stop_brightness = array("d")
+        # index of the last segment found, the render loop usually asks again
+        # for the same or the following segment
+        self._cursor = 0
+        # the last pixel with the values it was made from, as one reference
+        # so concurrent readers never pair a value with another's pixel
+        self._last: Tuple[Tuple[int, int, int, float], Pixel] = ((0, 0, 0, 0.0), BLACK)
+        self.splice(0, 0, rules)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def copy(self) -> "DaySchedule":
+        schedule = DaySchedule()
+        for name in ARRAYS:
+            setattr(schedule, name, getattr(self, name)[:])
+        return schedule
+
+    def splice(self, lo: int, hi: int, rules: Iterable[Rule]) -> None:
+        """Replace the compiled segments lo:hi with the given (sorted) rules."""
+        rules = list(rules)
+        self.starts[lo:hi] = array("i", [r.start_seconds for r in rules])
+        self.stops[lo:hi] = array("i", [r.stop_seconds for r in rules])
+        self.start_rgb[lo:hi] = array("I", [pack_rgb(r.start_color) for r in rules])
+        self.stop_rgb[lo:hi] = array("I", [pack_rgb(r.stop_color) for r in rules])
+        self.start_brightness[lo:hi] = array(
+            "d", [r.start_color.brightness for r in rules]
+        )
+        self.stop_brightness[lo:hi] = array(
+            "d", [r.stop_color.brightness for r in rules]
+        )
+        self._cursor = 0
+
+    def find(self, now: float) -> int:
+        """Index of the segment active at now, or -1 if there is none."""
+        starts, stops = self.starts, self.stops
+        cursor = self._cursor
+        for index in (cursor, cursor + 1):
+            if index < len(starts) and starts[index] <= now <= stops[index]:
+                self._cursor = index
+                return index
+        index = bisect_right(starts, now) - 1
+        if index < 0 or now > stops[index]:
+            return -1
+        self._cursor = index
+        return index
+
+    def percentage(self, index: int, now: float) -> float:
+        start = self.starts[index]
+        return (int(now) - start) / (self.stops[index] - start)
+
+    def pixel_at(self, now: float) -> Pixel:
+        pixel = self.active_pixel(now)
+        return BLACK if pixel is None else pixel
+
+    def active_pixel(self, now: float) -> Optional[Pixel]:
+        """The pixel of the segment active at now, None if there is none."""
+        index = self.find(now)
+        if index < 0:
+            return None
+        return self.segment_pixel(index, now)
+
+    def segment_pixel(self, index: int, now: float) -> Pixel:
+        """The pixel of segment index at now."""
+        percentage = self.percentage(index, now)
+        r1, g1, b1 = unpack_rgb(self.start_rgb[index])
+        r2, g2, b2 = unpack_rgb(self.stop_rgb[index])
+        brightness1 = self.start_brightness[index]
+        brightness2 = self.stop_brightness[index]
+        value = (
+            int(r1 + (r2 - r1) * percentage),
+            int(g1 + (g2 - g1) * percentage),
+            int(b1 + (b2 - b1) * percentage),
+            brightness1 + (brightness2 - brightness1) * percentage,
+        )
+        last_value, pixel = self._last
+        if value != last_value:
+            pixel = Pixel(*value)
+            self._last = (value, pixel)
+        return pixel
+
+    def next_change(self, now: float) -> float:
+        """
+        Seconds from now until pixel_at returns a different pixel: the next
+        segment boundary, or the next second at which a gradient moves any
+        8-bit channel (brightness counted in 1/255 steps).
+        """
+        index = self.find(now)
+        if index < 0:
+            following = bisect_right(self.starts, now)
+            if following < len(self.starts):
+                return self.starts[following] - now
+            return DAY_SECONDS - now
+        start, stop = self.starts[index], self.stops[index]
+        span = stop - start
+        second = int(now)
+        change = stop + 1
+        r1, g1, b1 = unpack_rgb(self.start_rgb[index])
+        r2, g2, b2 = unpack_rgb(self.stop_rgb[index])
+        channels = (
+            (r1, r2),
+            (g1, g2),
+            (b1, b2),
+            (self.start_brightness[index] * 255, self.stop_brightness[index] * 255),
+        )
+        for c1, c2 in channels:
+            delta = c2 - c1
+            if not delta:
+                continue
+            value = int(c1 + delta * (second - start) / span)
+            if delta > 0:
+                # first second reaching value + 1
+                offset = ceil((value + 1 - c1) * span / delta)
+            else:
+                # first second dropping below value
+                offset = floor((value - c1) * span / delta) + 1
+            change = min(change, max(start + offset, second + 1))
+        return change - now
@@ -0,0 +1,152 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from app.services.pi_light.color import Color
+from app.services.pi_light.day import Day
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.schedule import ARRAYS, DaySchedule, unpack_rgb
+from app.services.pi_light.zone import Zone
+from app.services.simple_time import to_time
+
+# magic, format version, number of days and number of layers, followed by
+# every layer: its zone's first and last pixel (-1 for the whole strip), the
+# number of segments of every day and then every day's arrays, little-endian
+MAGIC = b"PLSS"
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+DAYS = list(Day)
+ZONE = struct.Struct("<ii")
+COUNTS = struct.Struct(f"<{len(DAYS)}I")
+SWAP = sys.byteorder != "little"
+
+# a layer's compiled schedules, by zone (None for the whole strip)
+Layers = Dict[Optional[Zone], Dict[Day, DaySchedule]]
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def save(path: str, layers: Layers) -> None:
+    """
+    Write the compiled schedules to path. The snapshot is written next to it
+    and renamed over it, so a crash never leaves a partial snapshot behind.
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(DAYS), len(layers)))
+        for zone, schedules in layers.items():
+            f.write(ZONE.pack(*((-1, -1) if zone is None else (zone.first, zone.last))))
+            f.write(COUNTS.pack(*(len(schedules[day]) for day in DAYS)))
+            for day in DAYS:
+                for name in ARRAYS:
+                    values = getattr(schedules[day], name)
+                    if SWAP:
+                        values = array(values.typecode, values)
+                        values.byteswap()
+                    values.tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def load(path: str) -> Layers:
+    with open(path, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise SnapshotError("empty snapshot")
+    with mapped:
+        if len(mapped) < HEADER.size:
+            raise SnapshotError("truncated snapshot")
+        magic, version, days, layer_count = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION or days != len(DAYS):
+            raise SnapshotError(f"unsupported snapshot {magic!r} version {version}")
+        offset = HEADER.size
+        layers: Layers = {}
+        for _ in range(layer_count):
+            if offset + ZONE.size + COUNTS.size > len(mapped):
+                raise SnapshotError("truncated snapshot")
+            first, last = ZONE.unpack_from(mapped, offset)
+            zone = None if first < 0 else Zone.construct(first=first, last=last)
+            counts = COUNTS.unpack_from(mapped, offset + ZONE.size)
+            offset += ZONE.size + COUNTS.size
+            schedules = layers[zone] = {}
+            for day, count in zip(DAYS, counts):
+                schedule = DaySchedule()
+                for name in ARRAYS:
+                    values = array(getattr(schedule, name).typecode)
+                    end = offset + values.itemsize * count
+                    if end > len(mapped):
+                        raise SnapshotError("truncated snapshot")
+                    values.frombytes(mapped[offset:end])
+                    if SWAP:
+                        values.byteswap()
+                    setattr(schedule, name, values)
+                    offset = end
+                schedules[day] = schedule
+        if offset != len(mapped):
+            raise SnapshotError("trailing data in snapshot")
+    return layers
+
+
+def rules(day: Day, schedule: DaySchedule, zone: Optional[Zone] = None) -> List[Rule]:
+    """
+    Rebuild a day's rules from its compiled schedule. Snapshots are only
+    written from validated rules so the models are constructed directly, and
+    colors are shared between rules since they are immutable.
+    """
+    colors: Dict[Tuple[int, float], Color] = {}
+    day_value = day.value
+
+    def color(rgb: int, brightness: float) -> Color:
+        key = (rgb, brightness)
+        if key not in colors:
+            r, g, b = unpack_rgb(rgb)
+            colors[key] = Color.construct(r=r, g=g, b=b, brightness=brightness)
+        return colors[key]
+
+    return [
+        Rule.construct(
+            day=day_value,
+            start_time=to_time(start),
+            stop_time=to_time(stop),
+            start_color=color(start_rgb, start_brightness),
+            stop_color=color(stop_rgb, stop_brightness),
+            zone=zone,
+        )
+        for start, stop, start_rgb, stop_rgb, start_brightness, stop_brightness in zip(
+            schedule.starts,
+            schedule.stops,
+            schedule.start_rgb,
+            schedule.stop_rgb,
+            schedule.start_brightness,
+            schedule.stop_brightness,
+        )
+    ]
+
+
+def main() -> None:
+    from app.services.pi_light.rule_manager import RuleManager
+
+    parser = argparse.ArgumentParser(
+        description="Convert a JSON or JSON Lines rule file to a schedule snapshot"
+    )
+    parser.add_argument("rule_file")
+    parser.add_argument("snapshot")
+    args = parser.parse_args()
+
+    rule_manager = RuleManager()
+    report = rule_manager.load_rules(args.rule_file)
+    if report is None:
+        sys.exit(1)
+    rule_manager.save_snapshot(args.snapshot)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Set, Tuple
+
+
+class StatusFeed:
+    """
+    Wakes asyncio subscribers when the light's status changes. Subscribers
+    read the latest status themselves when woken, so publishing never blocks
+    the render loop and a slow subscriber only misses intermediate states.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+
+    def publish(self) -> None:
+        with self._lock:
+            subscribers = tuple(self._subscribers)
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the subscriber's loop is closed
+                pass
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Event]:
+        """An event set on every change, to be cleared by the subscriber."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
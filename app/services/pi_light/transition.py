@@ -0,0 +1,73 @@
+import time
+from typing import Callable, Union
+
+# each channel is a 32-bit lane holding its value in 16.16 fixed point
+_LANE = 4
+_FRACTION = 16
+
+
+def _pack(frame: Union[bytes, bytearray]) -> int:
+    # rounds to the nearest value when the fraction is truncated on unpacking
+    lanes = bytearray(_LANE * len(frame))
+    lanes[1::_LANE] = b"\x80" * len(frame)
+    lanes[2::_LANE] = frame
+    return int.from_bytes(lanes, "little")
+
+
+class Transition:
+    """
+    A cross-fade from one RGB frame to another. Every channel is a
+    fixed-point lane of a single int, and the per-channel step deltas are
+    computed once, so each transition frame is one integer addition followed
+    by slicing the integer part out of every lane.
+    """
+
+    def __init__(
+        self,
+        source: Union[bytes, bytearray],
+        target: Union[bytes, bytearray],
+        duration: float,
+        fps: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.target = bytes(target)
+        self.duration = duration
+        self.steps = max(round(duration * fps), 1)
+        self.frame_time = duration / self.steps
+        self.clock = clock
+        self.started = clock()
+        self.step = 0
+        self._value = _pack(source)
+        # lanes never go negative, flooring the deltas loses less than 1/65536
+        # per step and the lanes start half a unit up
+        self._delta = sum(
+            (((t - s) << _FRACTION) // self.steps) << (8 * _LANE * index)
+            for index, (s, t) in enumerate(zip(source, self.target))
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.step >= self.steps
+
+    def remaining(self) -> float:
+        if self.done:
+            return 0.0
+        return max(self.started + self.duration - self.clock(), 0.0)
+
+    def render(self, frame: bytearray) -> float:
+        """
+        Write the next frame into frame and return the seconds until the one
+        after. Frames that are already late are skipped.
+        """
+        now = self.clock()
+        step = max(int((now - self.started) / self.frame_time) + 1, self.step + 1)
+        if step >= self.steps:
+            self.step = self.steps
+            frame[:] = self.target
+            return 0.0
+        self._value += self._delta * (step - self.step)
+        self.step = step
+        frame[:] = self._value.to_bytes(_LANE * len(frame), "little")[
+            _FRACTION // 8 :: _LANE
+        ]
+        return max(self.started + step * self.frame_time - self.clock(), 0.0)
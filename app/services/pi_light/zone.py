@@ -0,0 +1,19 @@
+from pydantic import BaseModel, Extra, Field, validator
+
+
+class Zone(BaseModel):
+    first: int = Field(..., ge=0, title="First pixel")
+    last: int = Field(..., ge=0, title="Last pixel")
+
+    class Config:
+        frozen = True
+        extra = Extra.forbid
+
+    @validator("last")
+    def last_after_first(cls, v, values, **kwargs):
+        if "first" in values and v < values["first"]:
+            raise ValueError("first is after last")
+        return v
+
+    def __str__(self) -> str:
+        return f"pixels {self.first}-{self.last}"
@@ -1,8 +1,26 @@
 from datetime import time
+from functools import lru_cache
+from typing import NewType
 
 import pydantic
 from pydantic import Field
 
+# seconds since midnight, used internally instead of SimpleTime where only
+# comparisons and +/- arithmetic are needed
+DaySeconds = NewType("DaySeconds", int)
+DAY_SECONDS = 24 * 3600
+
+
+@lru_cache(maxsize=DAY_SECONDS)
+def to_seconds(t: time) -> DaySeconds:
+    return DaySeconds(t.hour * 3600 + t.minute * 60 + t.second)
+
+
+@lru_cache(maxsize=DAY_SECONDS)
+def to_time(seconds: int) -> time:
+    seconds = seconds % DAY_SECONDS
+    return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
 
 @pydantic.dataclasses.dataclass
 class SimpleTime:
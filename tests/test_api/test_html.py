@@ -0,0 +1,61 @@
+import pytest
+
+from app.api.routes.html import rules_fragment
+from app.core.light import get_light
+from app.services.pi_light.day import Day
+from app.services.pi_light.rule import Rule
+
+
+@pytest.mark.usefixtures("client")
+class TestLightForm:
+    def setup_method(self) -> None:
+        self.rule_manager = get_light().rule_manager
+        self.rule = Rule(day=Day.TUESDAY, start_time="1:0:0", stop_time="2:30:0")
+
+    def teardown_method(self) -> None:
+        self.rule_manager.remove_rules_by_hash([self.rule.hash])
+
+    def test_rules_rendered_until_changed(self) -> None:
+        response = self.client.get("/")
+
+        assert response.status_code == 200
+        assert "<legend>Tuesday</legend>" in response.text
+        assert self.rule.time_interval() not in response.text
+        fragment = rules_fragment.render(self.rule_manager, self.rule_manager.version)
+        assert fragment in response.text
+
+        self.rule_manager.add_rule(self.rule)
+        response = self.client.get("/")
+
+        assert self.rule.time_interval() in response.text
+        assert f'value="{self.rule.hash}"' in response.text
+
+    def test_remove_rule(self) -> None:
+        self.rule_manager.add_rule(self.rule)
+
+        response = self.client.post(
+            "/", data={"remove_rule": "1", "rule_hashes": [str(self.rule.hash)]}
+        )
+
+        assert response.status_code == 200
+        assert self.rule not in self.rule_manager.rules[Day.TUESDAY]
+        assert self.rule.time_interval() not in response.text
+
+    def test_add_rule(self) -> None:
+        response = self.client.post(
+            "/",
+            data={
+                "add_rule": "1",
+                "day": "Tuesday",
+                "start_time": "01:00",
+                "stop_time": "02:30",
+                "start_color": "#000000",
+                "start_color_brightness": "0",
+                "stop_color": "#000000",
+                "stop_color_brightness": "0",
+            },
+        )
+
+        assert response.status_code == 200
+        assert self.rule in self.rule_manager.rules[Day.TUESDAY]
+        assert self.rule.time_interval() in response.text
@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.light import get_light, get_light_async
+from app.main import app
+from app.services.pi_light.day import Day
+from app.services.pi_light.light import Light
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.zone import Zone
+
+
+@pytest.mark.usefixtures("client")
+class TestMetricsApi:
+    def setup_method(self) -> None:
+        self.light = Light()
+        app.dependency_overrides[get_light] = lambda: self.light
+        app.dependency_overrides[get_light_async] = lambda: self.light
+
+    def teardown_method(self) -> None:
+        app.dependency_overrides.clear()
+
+    def test_metrics(self) -> None:
+        self.light.wait(0.001)
+
+        response = self.client.get("/api/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        assert "# TYPE pi_light_tick_seconds histogram" in lines
+        assert "pi_light_sleep_drift_seconds_count 1" in lines
+        assert "pi_light_rules_version 0" in lines
+        assert "pi_light_snapshot_flushes_total 0" in lines
+
+    def test_metrics_count_rules(self) -> None:
+        zone = Zone(first=0, last=4)
+        self.light.rule_manager.add_rules(
+            [
+                Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0"),
+                Rule(day=Day.FRIDAY, start_time="1:0:0", stop_time="2:0:0"),
+                Rule(day=Day.MONDAY, zone=zone),
+            ]
+        )
+
+        lines = self.client.get("/api/metrics").text.splitlines()
+
+        assert "pi_light_rules 3" in lines
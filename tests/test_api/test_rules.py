@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from app.core.light import get_light, get_light_async
+from app.main import app
+from app.services.pi_light.day import Day
+from app.services.pi_light.light import Light
+from app.services.pi_light.rule import Rule
+
+
+@pytest.mark.usefixtures("client")
+class TestRulesApi:
+    def setup_method(self) -> None:
+        self.light = Light()
+        app.dependency_overrides[get_light] = lambda: self.light
+        app.dependency_overrides[get_light_async] = lambda: self.light
+
+    def teardown_method(self) -> None:
+        app.dependency_overrides.clear()
+
+    def test_add_rules(self) -> None:
+        rules = [
+            Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0"),
+            Rule(day=Day.MONDAY, start_time="1:30:0", stop_time="3:0:0"),
+            Rule(day=Day.FRIDAY, start_time="1:0:0", stop_time="2:0:0"),
+        ]
+
+        response = self.client.post(
+            "/api/rules/batch", json=[json.loads(rule.json()) for rule in rules]
+        )
+
+        assert response.status_code == 200
+        assert response.json()["received"] == 3
+        assert response.json()["rules"]["Monday"] == 2
+        assert response.json()["rules"]["Friday"] == 1
+        assert response.json()["rules"]["Sunday"] == 0
+
+    def test_add_rules_invalid(self) -> None:
+        response = self.client.post(
+            "/api/rules/batch", json=[{"start_time": "2:0:0", "stop_time": "1:0:0"}]
+        )
+
+        assert response.status_code == 422
+
+    def test_get_rules_not_modified(self) -> None:
+        rule = Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0")
+        self.light.rule_manager.add_rule(rule)
+
+        response = self.client.get("/api/rules")
+        etag = response.headers["etag"]
+
+        assert response.status_code == 200
+        assert response.json()["Monday"] == [json.loads(rule.json())]
+        assert response.json()["Sunday"] == []
+
+        response = self.client.get("/api/rules", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+        response = self.client.get(
+            "/api/rules", headers={"If-None-Match": f'"other", W/{etag}'}
+        )
+
+        assert response.status_code == 304
+
+    def test_get_rules_modified(self) -> None:
+        etag = self.client.get("/api/rules").headers["etag"]
+        rule = Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0")
+
+        response = self.client.post("/api/rules", json=json.loads(rule.json()))
+
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert len(response.json()["Monday"]) == 1
+
+        response = self.client.get("/api/rules", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert len(response.json()["Monday"]) == 1
+
+    def test_remove_rule(self) -> None:
+        rule = Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0")
+        self.light.rule_manager.add_rule(rule)
+
+        response = self.client.delete("/api/rules", json=json.loads(rule.json()))
+
+        assert response.status_code == 200
+        assert response.json()["Monday"] == []
+
+        response = self.client.delete("/api/rules", json=json.loads(rule.json()))
+
+        assert response.status_code == 400
+
+    def test_current_rule(self) -> None:
+        rules = [Rule(day=day) for day in Day]
+        self.light.rule_manager.add_rules(rules)
+
+        response = self.client.get("/api/rules/current")
+
+        assert response.status_code == 200
+        rule, _ = response.json()
+        assert Rule(**rule) in rules
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import threading
+
+from app.api.routes.api import status_events
+from app.services.pi_light.color import Color
+from app.services.pi_light.light import Light
+from app.services.pi_light.mode import Mode
+
+
+class TestStatusEvents:
+    def setup_method(self) -> None:
+        self.light = Light()
+
+    def test_sends_changes(self) -> None:
+        async def collect():
+            events = status_events(self.light, interval=0, keepalive=5)
+            first = await events.__anext__()
+            assert len(self.light.status_feed) == 1
+            # published from another thread, as the render loop does
+            color = Color(r=1, g=2, b=3, brightness=0.5)
+            threading.Thread(target=setattr, args=(self.light, "color", color)).start()
+            second = await asyncio.wait_for(events.__anext__(), 5)
+            await events.aclose()
+            return first, second
+
+        first, second = asyncio.run(collect())
+
+        assert first.startswith("data: ") and first.endswith("\n\n")
+        assert json.loads(first[6:])["mode"] == Mode.DEFAULT.value
+        assert json.loads(second[6:])["color"] == {
+            "r": 1,
+            "g": 2,
+            "b": 3,
+            "brightness": 0.5,
+        }
+        assert len(self.light.status_feed) == 0
+
+    def test_coalesces_changes(self) -> None:
+        async def collect():
+            events = status_events(self.light, interval=0.2, keepalive=5)
+            await events.__anext__()
+            for mode in (Mode.RAINBOW, Mode.BREATHE, Mode.CHASE):
+                self.light.set_mode(mode)
+            second = await asyncio.wait_for(events.__anext__(), 5)
+            await events.aclose()
+            return second
+
+        second = asyncio.run(collect())
+
+        assert json.loads(second[6:])["mode"] == Mode.CHASE.value
+
+    def test_keepalive(self) -> None:
+        async def collect():
+            events = status_events(self.light, interval=0, keepalive=0.01)
+            await events.__anext__()
+            second = await events.__anext__()
+            await events.aclose()
+            return second
+
+        assert asyncio.run(collect()) == ": keepalive\n\n"
@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from app.benchmark import Options, compare, run
+
+
+class TestBenchmark(TestCase):
+    def test_run(self) -> None:
+        report = run(
+            Options(rule_counts=(14,), file_rules=20, repeat=1, min_time=0.001)
+        )
+
+        names = {result["name"] for result in report["results"]}
+        self.assertTrue(
+            {"add_rule", "current_color", "load_rules", "GET /api/rules"} <= names
+        )
+        self.assertTrue(all(result["seconds"] > 0 for result in report["results"]))
+        self.assertListEqual([], compare(report, report, 0.0))
+
+    def test_compare(self) -> None:
+        baseline = {
+            "results": [
+                {"name": "a", "params": {"rules": 1}, "seconds": 1.0},
+                {"name": "a", "params": {"rules": 2}, "seconds": 1.0},
+            ]
+        }
+        report = {
+            "results": [
+                {"name": "a", "params": {"rules": 1}, "seconds": 1.1},
+                {"name": "a", "params": {"rules": 2}, "seconds": 1.5},
+                {"name": "b", "params": {}, "seconds": 9.0},
+            ]
+        }
+
+        self.assertListEqual(
+            ['a {"rules": 2} 1.50x slower'], compare(report, baseline, 0.2)
+        )
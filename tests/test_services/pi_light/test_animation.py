@@ -0,0 +1,126 @@
+from unittest import TestCase
+
+from app.services.pi_light import fake_board
+from app.services.pi_light.animation import (
+    ANIMATIONS,
+    Animation,
+    Breathe,
+    Chase,
+    Rainbow,
+    Renderer,
+    Twinkle,
+)
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.frame import new_frame, rainbow_frame, rainbow_positions
+from app.services.pi_light.mode import Mode
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestAnimation(TestCase):
+    color = Pixel(200, 100, 50, 0.5)
+
+    def test_registry(self) -> None:
+        self.assertNotIn(Mode.DEFAULT, ANIMATIONS)
+        self.assertNotIn(Mode.RULES, ANIMATIONS)
+        self.assertIs(Rainbow, ANIMATIONS[Mode.RAINBOW])
+
+    def test_render_is_required(self) -> None:
+        class Incomplete(Animation):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete(33, self.color)  # type: ignore
+
+    def test_frame_size(self) -> None:
+        for mode, animation_cls in ANIMATIONS.items():
+            animation = animation_cls(33, self.color)
+            frame = new_frame(33)
+            for elapsed in (0.0, 0.5, 1.25, 30.0):
+                animation.render(frame, elapsed)
+                self.assertEqual(99, len(frame), mode)
+
+    def test_rainbow(self) -> None:
+        frame = new_frame(33)
+        expected_frame = new_frame(33)
+        rainbow_frame(rainbow_positions(33), 5, expected_frame)
+
+        Rainbow(33, self.color).render(frame, 1.0)
+
+        self.assertEqual(expected_frame, frame)
+
+    def test_breathe(self) -> None:
+        animation = Breathe(3, self.color)
+        frame = new_frame(3)
+
+        animation.render(frame, 0.0)
+        self.assertEqual(bytearray(9), frame)
+
+        animation.render(frame, animation.period / 2)
+        self.assertEqual(bytearray([200, 100, 50] * 3), frame)
+
+    def test_chase(self) -> None:
+        animation = Chase(10, self.color)
+        frame = new_frame(10)
+
+        animation.render(frame, 0.0)
+        self.assertEqual(
+            bytearray([200, 100, 50] * 2 + [0] * 18 + [200, 100, 50] * 2), frame
+        )
+
+        animation.render(frame, 0.1)
+        self.assertEqual(
+            bytearray([0] * 3 + [200, 100, 50] * 2 + [0] * 18 + [200, 100, 50]), frame
+        )
+
+    def test_twinkle_fades(self) -> None:
+        animation = Twinkle(10, self.color)
+        frame = new_frame(10)
+        animation.levels = bytearray([255] * 10)
+        animation.sparkles_per_second = 0
+
+        animation.render(frame, animation.half_life)
+
+        self.assertEqual(bytearray([127] * 10), animation.levels)
+        self.assertEqual(bytearray([99, 49, 24] * 10), frame)
+
+
+class TestRenderer(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.renderer = Renderer(fake_board.Board, 33, 10, 0.5, clock=self.clock)
+
+    def test_render(self) -> None:
+        delay = self.renderer.render(Mode.RAINBOW, Pixel())
+
+        self.assertAlmostEqual(0.1, delay)
+        self.assertIsInstance(self.renderer.animation, Rainbow)
+        self.assertEqual(1, self.renderer.frames)
+
+    def test_render_on_time(self) -> None:
+        for _ in range(5):
+            self.clock.now += self.renderer.render(Mode.RAINBOW, Pixel())
+
+        self.assertEqual(5, self.renderer.frames)
+        self.assertEqual(0, self.renderer.dropped_frames)
+
+    def test_render_drops_frames_when_behind(self) -> None:
+        self.renderer.render(Mode.RAINBOW, Pixel())
+        self.clock.now += 0.35
+
+        delay = self.renderer.render(Mode.RAINBOW, Pixel())
+
+        self.assertEqual(2, self.renderer.dropped_frames)
+        self.assertAlmostEqual(0.05, delay)
+
+    def test_render_restarts_on_change(self) -> None:
+        self.renderer.render(Mode.RAINBOW, Pixel())
+        self.renderer.render(Mode.CHASE, Pixel(r=1))
+
+        self.assertIsInstance(self.renderer.animation, Chase)
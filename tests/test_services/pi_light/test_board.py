@@ -0,0 +1,55 @@
+import importlib
+import sys
+from types import ModuleType
+from typing import List
+from unittest import TestCase, mock
+
+import pytest
+
+from app.services.pi_light.color import Pixel
+
+
+class FakeNeoPixel:
+    bpp = 3
+    byteorder = "GRB"
+
+    def __init__(self, spi, n: int, brightness: float, auto_write: bool):
+        self.n = n
+        self.written: List[bytes] = []
+
+    def _transmit(self, buffer: bytearray) -> None:
+        self.written.append(bytes(buffer))
+
+
+class TestBoard(TestCase):
+    """The production board, with the hardware libraries replaced."""
+
+    def import_board(self, neopixel_class: type) -> ModuleType:
+        board = ModuleType("board")
+        board.SPI = lambda: None  # type: ignore
+        neopixel_spi = ModuleType("neopixel_spi")
+        neopixel_spi.NeoPixel_SPI = neopixel_class  # type: ignore
+        modules = {"board": board, "neopixel_spi": neopixel_spi}
+        with mock.patch.dict(sys.modules, modules):
+            sys.modules.pop("app.services.pi_light.board", None)
+            try:
+                return importlib.import_module("app.services.pi_light.board")
+            finally:
+                sys.modules.pop("app.services.pi_light.board", None)
+
+    def test_show_transmits_encoded_frame(self) -> None:
+        module = self.import_board(FakeNeoPixel)
+        pixels = module.Board.pixels
+
+        module.Board.fill(Pixel(255, 0, 0, 1.0))
+
+        (buffer,) = pixels.written
+        self.assertEqual(bytes((0, 255, 0)) * pixels.n, buffer)
+        self.assertEqual(1, module.Board.writes)
+
+    def test_missing_transmit_fails_on_import(self) -> None:
+        class NoTransmit(FakeNeoPixel):
+            _transmit = None  # type: ignore
+
+        with pytest.raises(RuntimeError, match="_transmit"):
+            self.import_board(NoTransmit)
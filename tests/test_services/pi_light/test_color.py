@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from app.services.pi_light.color import Color
+from app.services.pi_light.color import Color, Pixel
 
 
 class TestColor(TestCase):
@@ -32,3 +32,27 @@ class TestColor(TestCase):
     def test_random(self) -> None:
         for i in range(20):
             Color.random()
+
+
+class TestPixel(TestCase):
+    def test_from_color(self) -> None:
+        color = Color(r=1, g=2, b=4, brightness=0.5)
+
+        self.assertEqual(Pixel(1, 2, 4, 0.5), Pixel.from_color(color))
+        self.assertEqual(color, Pixel.from_color(color).to_color())
+
+    def test_gradient(self) -> None:
+        color1 = Color(r=1, g=2, b=4, brightness=0.5)
+        color2 = Color(r=5, g=6, b=11, brightness=1)
+
+        for percentage in (0.0, 0.25, 0.5, 0.9, 1.0):
+            self.assertEqual(
+                Color.gradient(color1, color2, percentage),
+                Pixel.gradient(
+                    Pixel.from_color(color1), Pixel.from_color(color2), percentage
+                ).to_color(),
+            )
+
+    def test_hash(self) -> None:
+        self.assertEqual(hash(Pixel(1, 2, 3, 0.5)), hash(Pixel(1, 2, 3, 0.5)))
+        self.assertNotEqual(Pixel(1, 2, 3, 0.5), Pixel(1, 2, 3, 0.6))
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.fake_board import Board
+
+
+class TestFakeBoard(TestCase):
+    def setUp(self) -> None:
+        Board.last_frame = None
+        Board.writes = 0
+        Board.skipped_writes = 0
+        Board.output.dithering = False
+
+    def test_fill_skips_unchanged_frame(self) -> None:
+        pixel = Pixel(1, 2, 3, 0.5)
+
+        Board.fill(pixel)
+        Board.fill(Pixel(1, 2, 3, 0.5))
+
+        self.assertEqual(1, Board.writes)
+        self.assertEqual(1, Board.skipped_writes)
+
+    def test_fill_writes_changed_frame(self) -> None:
+        Board.fill(Pixel(1, 2, 3, 0.5))
+        Board.fill(Pixel(1, 2, 3, 0.6))
+        Board.fill(Pixel(1, 2, 4, 0.6))
+
+        self.assertEqual(3, Board.writes)
+        self.assertEqual(0, Board.skipped_writes)
+
+    def test_show_invalidates_frame(self) -> None:
+        pixel = Pixel(1, 2, 3, 0.5)
+
+        Board.fill(pixel)
+        Board.show(bytearray(99), 0.5)
+        Board.fill(pixel)
+
+        self.assertEqual(3, Board.writes)
+        self.assertEqual(0, Board.skipped_writes)
+
+    def test_fill_refreshes_dithered_frame(self) -> None:
+        pixel = Pixel(255, 255, 255, 0.03)
+
+        self.assertTrue(Board.fill(pixel))
+        self.assertTrue(Board.fill(pixel))
+
+        self.assertEqual(2, Board.writes)
+        self.assertEqual(0, Board.skipped_writes)
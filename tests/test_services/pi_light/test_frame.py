@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from app.services.pi_light.color import Pixel
+from app.services.pi_light.frame import (
+    new_frame,
+    paint,
+    rainbow_frame,
+    rainbow_positions,
+    wheel,
+)
+
+
+class TestFrame(TestCase):
+    def test_wheel(self) -> None:
+        self.assertEqual((0, 255, 0), wheel(0))
+        self.assertEqual((255, 0, 0), wheel(85))
+        self.assertEqual((0, 0, 255), wheel(170))
+        self.assertEqual((0, 0, 0), wheel(256))
+
+    def test_new_frame(self) -> None:
+        self.assertEqual(bytearray(99), new_frame(33))
+
+    def test_paint(self) -> None:
+        frame = new_frame(4)
+
+        paint(frame, 1, 3, Pixel(r=100, g=50, b=10, brightness=0.5))
+        paint(frame, 3, 10, Pixel(r=1, g=2, b=3, brightness=1))
+        paint(frame, 5, 6, Pixel(r=9, g=9, b=9, brightness=1))
+
+        self.assertEqual(bytes([0, 0, 0, 72, 36, 7, 72, 36, 7, 1, 2, 3]), frame)
+
+    def test_rainbow_frame(self) -> None:
+        for led_count in (1, 33, 256, 300):
+            positions = rainbow_positions(led_count)
+            frame = new_frame(led_count)
+            for step in (0, 1, 100, 254):
+                rainbow_frame(positions, step, frame)
+                expected_frame = bytearray()
+                for i in range(led_count):
+                    pixel_index = (i * 256 // led_count) + step
+                    expected_frame.extend(wheel(pixel_index & 255))
+                self.assertEqual(expected_frame, frame)
@@ -1,12 +1,21 @@
+import itertools
+from typing import Callable, List, Optional, Tuple
+
 import testslide
 from testslide import TestCase
 from testslide.matchers import Any
 
-from app.services.pi_light import fake_board, rule_manager
-from app.services.pi_light.color import Color
+from app.core.config import Settings
+from app.services.pi_light import fake_board, light, rule_manager
+from app.services.pi_light.color import Color, Pixel
+from app.services.pi_light.day import Day
 from app.services.pi_light.light import Light
 from app.services.pi_light.mode import Mode
+from app.services.pi_light.rule_manager import Segments
 from app.services.pi_light.state import State
+from app.services.pi_light.zone import Zone
+
+SEGMENTS: Segments = (1, Day.MONDAY, ((None, 0),))
 
 
 class TestLight(TestCase):
@@ -20,14 +29,33 @@ class TestLight(TestCase):
         self.mock_constructor(rule_manager, "RuleManager").for_call().to_return_value(
             self.mock_rule_manager
         )
+        self.mock_callable(self.mock_rule_manager, "add_listener").for_call(
+            Any()
+        ).to_return_value(None)
         self.light = Light()
+        self.mock_callable(self.light, "wait").for_call(Any()).to_return_value(None)
+
+    def advance_time(self) -> None:
+        # every reading of the clock is a second later, so each iteration is
+        # past the deadline of the one before
+        clock = itertools.count()
+        self.mock_callable(light, "perf_counter").with_implementation(
+            lambda: float(next(clock))
+        )
+
+    def record_frames(self, frames: List[bytes]) -> Callable[[bytes, float], bool]:
+        def show(frame: bytes, brightness: float) -> bool:
+            frames.append(bytes(frame))
+            return False
+
+        return show
 
     def test_state(self) -> None:
         self.mock_callable(self.light, "state").to_return_values(
             [State.RUNNING, State.STOPPED]
         )
         self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
-            None
+            False
         ).and_assert_called_once()
         self.light.run()
 
@@ -36,7 +64,7 @@ class TestLight(TestCase):
             [State.RUNNING, State.STOPPED]
         )
         self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
-            None
+            False
         ).and_assert_called_once()
         self.light.run()
 
@@ -44,25 +72,253 @@ class TestLight(TestCase):
         self.mock_callable(self.light, "state").to_return_values(
             [State.RUNNING, State.STOPPED]
         )
-        self.mock_callable(self.light, "mode").to_return_value(Mode.RAINBOW)
+        self.light.set_mode(Mode.RAINBOW)
         self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
-            None
+            False
         ).and_assert_not_called()
-        self.mock_callable(self.mock_board, "rainbow_step").for_call().to_return_value(
-            None
-        ).and_assert_called_once()
+        self.mock_callable(self.mock_board, "show").for_call(
+            Any(), Any()
+        ).to_return_value(False).and_assert_called_once()
         self.light.run()
 
     def test_rules_mode(self) -> None:
         self.mock_callable(self.light, "state").to_return_values(
             [State.RUNNING, State.STOPPED]
         )
-        self.mock_callable(self.light, "mode").to_return_value(Mode.RULES)
-        expected_color = Color()
+        self.light.set_mode(Mode.RULES)
+        expected_pixel = Pixel(1, 2, 3, 0.5)
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).for_call().to_return_value(
+            (SEGMENTS, [(None, expected_pixel)])
+        ).and_assert_called_once()
         self.mock_callable(
-            self.mock_rule_manager, "current_color"
-        ).for_call().to_return_value(expected_color).and_assert_called_once()
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(1.5).and_assert_called_once()
         self.mock_callable(self.mock_board, "fill").for_call(
-            expected_color
-        ).to_return_value(None).and_assert_called_once()
+            expected_pixel
+        ).to_return_value(False).and_assert_called_once()
+        self.mock_callable(
+            self.light.status_feed, "publish"
+        ).for_call().to_return_value(None).and_assert_called_once()
+        self.mock_callable(self.light, "wait").for_call(1.5).to_return_value(
+            None
+        ).and_assert_called_once()
         self.light.run()
+
+        self.assertEqual(Color(r=1, g=2, b=3, brightness=0.5), self.light.color)
+
+    def test_rules_mode_does_not_overwrite_color(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.STOPPED]
+        )
+        self.light.set_mode(Mode.RULES)
+        color = Color(r=1, g=2, b=3, brightness=0.5)
+
+        def current_segments() -> Tuple[Segments, List[Tuple[Optional[Zone], Pixel]]]:
+            # an API thread switching away from rules mid iteration
+            self.light.set_mode(Mode.DEFAULT)
+            self.light.color = color
+            return SEGMENTS, [(None, Pixel(255, 0, 0, 1.0))]
+
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).with_implementation(current_segments)
+        self.mock_callable(
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(1.5)
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        )
+
+        self.light.run()
+
+        self.assertEqual(color, self.light.color)
+        self.light.set_mode(Mode.BREATHE)
+        self.assertEqual(color, self.light.color)
+
+    def test_rules_mode_zones(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        self.light.set_mode(Mode.RULES)
+        self.advance_time()
+        layers = [
+            (None, Pixel(100, 50, 0, 0.5)),
+            (Zone(first=1, last=2), Pixel(0, 0, 255, 1.0)),
+            (Zone(first=30, last=40), Pixel(10, 10, 10, 1.0)),
+        ]
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).for_call().to_return_value((SEGMENTS, layers)).and_assert_called_exactly(2)
+        self.mock_callable(
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(1.5)
+        frames = []
+        self.mock_callable(self.mock_board, "show").for_call(
+            Any(), 1.0
+        ).with_implementation(self.record_frames(frames)).and_assert_called_once()
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        ).and_assert_not_called()
+        self.light.run()
+
+        (frame,) = frames
+        self.assertEqual(bytes((72, 36, 0)), frame[0:3])
+        self.assertEqual(bytes((0, 0, 255)) * 2, frame[3:9])
+        self.assertEqual(bytes((72, 36, 0)), frame[9:12])
+        self.assertEqual(bytes((10, 10, 10)) * 3, frame[90:])
+        self.assertEqual(Color(r=100, g=50, b=0, brightness=0.5), self.light.color)
+
+    def test_color_change_transition(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        color = Color(r=200, g=100, b=0, brightness=1.0)
+        self.mock_callable(self.light, "wait").for_call(Any()).with_implementation(
+            lambda seconds: setattr(self.light, "color", color)
+        )
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        ).and_assert_called_once()
+        frames = []
+        self.mock_callable(self.mock_board, "show").for_call(
+            Any(), 1.0
+        ).with_implementation(self.record_frames(frames)).and_assert_called_once()
+
+        self.light.run(Settings(transition_ms=10000, transition_fps=10))
+
+        (frame,) = frames
+        self.assertEqual(bytes((2, 1, 0)) * 33, frame)
+        self.assertAlmostEqual(10, self.light.transition_remaining(), delta=0.5)
+
+    def test_gradient_within_rule_does_not_fade(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        self.light.set_mode(Mode.RULES)
+        self.advance_time()
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).for_call().to_return_values(
+            [
+                (SEGMENTS, [(None, Pixel(100, 0, 0, 1.0))]),
+                (SEGMENTS, [(None, Pixel(101, 0, 0, 1.0))]),
+                (SEGMENTS, [(None, Pixel(102, 0, 0, 1.0))]),
+            ]
+        )
+        self.mock_callable(
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(1.0)
+        filled = []
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).with_implementation(
+            lambda pixel: filled.append(pixel) or False
+        )
+        self.mock_callable(self.mock_board, "show").for_call(
+            Any(), Any()
+        ).to_return_value(False).and_assert_not_called()
+
+        self.light.run(Settings(transition_ms=500))
+
+        self.assertListEqual([100, 101, 102], [pixel.r for pixel in filled])
+        self.assertIsNone(self.light.transition_remaining())
+
+    def test_new_rule_fades(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        self.light.set_mode(Mode.RULES)
+        self.advance_time()
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).for_call().to_return_values(
+            [
+                (SEGMENTS, [(None, Pixel(100, 0, 0, 1.0))]),
+                ((1, Day.MONDAY, ((None, 60),)), [(None, Pixel(0, 0, 100, 1.0))]),
+            ]
+        )
+        self.mock_callable(
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(1.0)
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        ).and_assert_called_once()
+        self.mock_callable(self.mock_board, "show").for_call(
+            Any(), 1.0
+        ).to_return_value(False).and_assert_called_once()
+
+        self.light.run(Settings(transition_ms=500))
+
+        self.assertIsNotNone(self.light.transition_remaining())
+
+    def test_transition_disabled(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        color = Color(r=200, g=100, b=0, brightness=1.0)
+        self.mock_callable(self.light, "wait").for_call(Any()).with_implementation(
+            lambda seconds: setattr(self.light, "color", color)
+        )
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        ).and_assert_called_exactly(2)
+
+        self.light.run(Settings(transition_ms=0))
+
+        self.assertIsNone(self.light.transition_remaining())
+
+    def test_dithering_refreshes(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.STOPPED]
+        )
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            True
+        ).and_assert_called_once()
+        self.mock_callable(self.light, "wait").for_call(0.01).to_return_value(
+            None
+        ).and_assert_called_once()
+
+        self.light.run(Settings(dither_fps=100))
+
+    def test_dithering_refresh_reuses_layers(self) -> None:
+        self.mock_callable(self.light, "state").to_return_values(
+            [State.RUNNING, State.RUNNING, State.RUNNING, State.STOPPED]
+        )
+        self.light.set_mode(Mode.RULES)
+        pixel = Pixel(1, 2, 3, 0.05)
+        self.mock_callable(
+            self.mock_rule_manager, "current_segments"
+        ).for_call().to_return_value(
+            (SEGMENTS, [(None, pixel)])
+        ).and_assert_called_once()
+        self.mock_callable(
+            self.mock_rule_manager, "next_change"
+        ).for_call().to_return_value(60.0).and_assert_called_once()
+        self.mock_callable(self.mock_board, "fill").for_call(pixel).to_return_value(
+            True
+        ).and_assert_called_exactly(3)
+        self.mock_callable(self.light, "wait").for_call(0.01).to_return_value(
+            None
+        ).and_assert_called_exactly(3)
+
+        self.light.run(Settings(dither_fps=100))
+
+        self.assertEqual(1, self.light.rules_seconds.count)
+
+    def test_changes_wake_run(self) -> None:
+        self.mock_callable(self.light, "wake").for_call().to_return_value(
+            None
+        ).and_assert_called_exactly(3)
+        self.light.set_mode(Mode.RULES)
+        self.light.color = Color(r=1)
+        self.light.set_state(State.STOPPED)
+
+    def test_start_stop(self) -> None:
+        self.mock_callable(self.mock_board, "fill").for_call(Any()).to_return_value(
+            False
+        )
+
+        self.light.start()
+        self.light.stop(timeout=5)
+
+        self.assertEqual(State.STOPPED, self.light.state())
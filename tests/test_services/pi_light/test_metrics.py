@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from app.services.pi_light.metrics import Exposition, Histogram
+
+
+class TestMetrics(TestCase):
+    def test_histogram(self) -> None:
+        histogram = Histogram((0.1, 1.0))
+
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+
+        self.assertListEqual([2, 1, 1], histogram.counts)
+        self.assertEqual(4, histogram.count)
+        self.assertAlmostEqual(2.65, histogram.sum)
+
+    def test_exposition(self) -> None:
+        histogram = Histogram((0.1, 1.0))
+        histogram.observe(0.5)
+        histogram.observe(2.0)
+        metrics = Exposition()
+
+        metrics.counter("writes_total", "Writes.", 3)
+        metrics.histogram("tick_seconds", "Ticks.", histogram)
+
+        self.assertEqual(
+            "# HELP writes_total Writes.\n"
+            "# TYPE writes_total counter\n"
+            "writes_total 3\n"
+            "# HELP tick_seconds Ticks.\n"
+            "# TYPE tick_seconds histogram\n"
+            'tick_seconds_bucket{le="0.1"} 0\n'
+            'tick_seconds_bucket{le="1.0"} 1\n'
+            'tick_seconds_bucket{le="+Inf"} 2\n'
+            "tick_seconds_sum 2.5\n"
+            "tick_seconds_count 2\n",
+            metrics.text(),
+        )
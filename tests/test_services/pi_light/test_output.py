@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from app.services.pi_light.output import Output, _tables
+
+
+class TestOutput(TestCase):
+    def test_tables_average_to_level(self) -> None:
+        tables, steady = _tables(2.2, 4, 0.03, 32)
+
+        for value in range(256):
+            level = 255 * (value / 255) ** 2.2 * 0.03
+            average = sum(table[value] for table in tables) / len(tables)
+            self.assertAlmostEqual(level, average, delta=0.125)
+        self.assertIn(0, steady)
+        self.assertNotIn(255, steady)
+        self.assertIs(tables, _tables(2.2, 4, 0.03, 32)[0])
+
+    def test_encode(self) -> None:
+        output = Output(2, gamma=1.0, dither_bits=0, bpp=4, byteorder="GRBW")
+
+        buffer = output.encode(bytes((10, 20, 30, 255, 0, 128)), 0.5)
+
+        self.assertEqual(bytes((10, 5, 15, 0, 0, 128, 64, 0)), buffer)
+        self.assertFalse(output.dithering)
+
+    def test_encode_dithers(self) -> None:
+        output = Output(2, gamma=1.0, dither_bits=2)
+        frame = bytes((3, 100, 0) * 2)
+
+        buffers = [bytes(output.encode(frame, 0.5)) for _ in range(4)]
+
+        self.assertTrue(output.dithering)
+        # 1.5 alternates between phases and between neighbouring pixels
+        self.assertListEqual([2, 1, 2, 1], [buffer[0] for buffer in buffers])
+        self.assertListEqual([1, 2, 1, 2], [buffer[3] for buffer in buffers])
+        self.assertTrue(all(buffer[1] == 50 for buffer in buffers))
+        output.encode(bytes((2, 100, 0) * 2), 0.5)
+        self.assertFalse(output.dithering)
+
+    def test_encode_rounds_above_dither_limit(self) -> None:
+        output = Output(2, gamma=1.0, dither_bits=2, dither_limit=32)
+
+        buffers = {
+            bytes(output.encode(bytes((201, 101, 0) * 2), 0.5)) for _ in range(4)
+        }
+
+        self.assertFalse(output.dithering)
+        self.assertSetEqual({bytes((101, 51, 0) * 2)}, buffers)
+        output.encode(bytes((31, 101, 0) * 2), 0.5)
+        self.assertTrue(output.dithering)
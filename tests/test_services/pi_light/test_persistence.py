@@ -0,0 +1,101 @@
+import os
+from tempfile import TemporaryDirectory
+from typing import Callable, List
+from unittest import TestCase, mock
+
+from app.services.pi_light import persistence
+from app.services.pi_light.day import Day
+from app.services.pi_light.persistence import RulePersister
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.rule_manager import RuleManager
+
+
+class FakeTimer:
+    def __init__(self, delay: float, function: Callable[[], None]):
+        self.delay = delay
+        self.function = function
+        self.started = False
+
+    def start(self) -> None:
+        self.started = True
+
+
+class TestRulePersister(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rules.snapshot")
+        self.rule_manager = RuleManager()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def add_rules(self) -> None:
+        self.rule_manager.add_rule(
+            Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0")
+        )
+        self.rule_manager.add_rule(
+            Rule(day=Day.MONDAY, start_time="3:0:0", stop_time="4:0:0")
+        )
+        self.rule_manager.remove_rule_by_hash(
+            hash(self.rule_manager.rules[Day.MONDAY][0])
+        )
+
+    def test_burst_is_flushed_once(self) -> None:
+        timers: List[FakeTimer] = []
+
+        def new_timer(delay: float, function: Callable[[], None]) -> FakeTimer:
+            timers.append(FakeTimer(delay, function))
+            return timers[-1]
+
+        with mock.patch.object(persistence.threading, "Timer", new_timer):
+            persister = RulePersister(self.rule_manager, self.path, delay=5)
+            persister.start()
+
+            self.add_rules()
+
+            self.assertEqual(1, len(timers))
+            self.assertEqual(5, timers[0].delay)
+            self.assertTrue(timers[0].started)
+            self.assertEqual(0, persister.flushes)
+            timers[0].function()
+
+            self.assertEqual(1, persister.flushes)
+            self.assertGreater(persister.last_flush_seconds, 0)
+            loaded = RuleManager()
+            self.assertTrue(loaded.load_snapshot(self.path))
+            self.assertDictEqual(self.rule_manager.rules, loaded.rules)
+            persister.stop()
+            self.assertEqual(1, persister.flushes)
+
+    def test_stop_flushes_pending_changes(self) -> None:
+        persister = RulePersister(self.rule_manager, self.path, delay=60)
+        persister.start()
+
+        self.add_rules()
+        self.assertFalse(os.path.exists(self.path))
+        persister.stop()
+
+        self.assertEqual(1, persister.flushes)
+        loaded = RuleManager()
+        self.assertTrue(loaded.load_snapshot(self.path))
+        self.assertDictEqual(self.rule_manager.rules, loaded.rules)
+
+    def test_stop_without_changes(self) -> None:
+        persister = RulePersister(self.rule_manager, self.path, delay=60)
+        persister.start()
+
+        persister.stop()
+
+        self.assertEqual(0, persister.flushes)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_failed_flush(self) -> None:
+        path = os.path.join(self.directory.name, "missing", "rules.snapshot")
+        persister = RulePersister(self.rule_manager, path, delay=60)
+        persister.start()
+
+        self.add_rules()
+        persister.stop()
+
+        self.assertEqual(0, persister.flushes)
+        self.assertEqual(1, persister.failed_flushes)
@@ -1,7 +1,11 @@
 from unittest import TestCase
 
+import pytest
+from pydantic import ValidationError
+
 from app.services.pi_light.day import Day
 from app.services.pi_light.rule import OverlapRegion, Rule
+from app.services.pi_light.zone import Zone
 
 
 class TestRule(TestCase):
@@ -48,6 +52,19 @@ class TestRule(TestCase):
         self.assertFalse(rule2.overlaps(rule5))
         self.assertFalse(rule6.overlaps(rule5))
 
+    def test_zones(self) -> None:
+        zone = Zone(first=0, last=9)
+        rule1 = Rule(day=Day.FRIDAY, start_time=1, stop_time=8)
+        rule2 = Rule(day=Day.FRIDAY, start_time=5, stop_time=8, zone=zone)
+        rule3 = Rule(day=Day.FRIDAY, start_time=1, stop_time=9, zone=zone)
+
+        self.assertFalse(rule1.overlaps(rule2))
+        self.assertFalse(rule2.within(rule1))
+        self.assertTrue(rule2.within(rule3))
+        self.assertNotEqual(rule1.hash, rule3.hash)
+        with pytest.raises(ValidationError):
+            Zone(first=10, last=9)
+
     def test_overlaps_head(self) -> None:
         rule1 = Rule(day=Day.FRIDAY, start_time=1, stop_time=8)
         rule2 = Rule(day=Day.FRIDAY, start_time=5, stop_time=8)
@@ -0,0 +1,125 @@
+import json
+import os
+from datetime import time
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from app.services.pi_light.color import Color
+from app.services.pi_light.day import Day
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.rule_loader import RuleValidator, load_rule_file
+from app.services.pi_light.rule_manager import RuleManager
+
+
+class TestRuleLoader(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.rule1 = Rule(
+            day=Day.MONDAY,
+            start_time="1:0:0",
+            stop_time="2:0:0",
+            start_color=Color(r=1, g=2, b=3, brightness=0.5),
+        )
+        self.rule2 = Rule(day=Day.MONDAY, start_time="1:30:0", stop_time="3:0:0")
+        self.rule3 = Rule(day=Day.FRIDAY, start_time="0:0:0", stop_time="0:0:10")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_load_json_lines(self) -> None:
+        path = self.write(
+            "rules.jsonl",
+            "\n".join(rule.json() for rule in (self.rule1, self.rule2, self.rule3)),
+        )
+
+        rules, report = load_rule_file(path)
+
+        self.assertListEqual([self.rule1, self.rule2, self.rule3], rules)
+        self.assertEqual(3, report.loaded)
+        self.assertListEqual([], report.errors)
+
+    def test_load_day_keyed(self) -> None:
+        data = {
+            "Monday": [json.loads(self.rule1.json())],
+            "Friday": [{"start_time": "0:0:0", "stop_time": "0:0:10"}],
+        }
+        path = self.write("rules.json", json.dumps(data))
+
+        rules, report = load_rule_file(path)
+
+        self.assertListEqual([self.rule1, self.rule3], rules)
+
+    def test_load_reports_invalid_records(self) -> None:
+        path = self.write(
+            "rules.jsonl",
+            "\n".join(
+                [
+                    self.rule1.json(),
+                    "{not json",
+                    '{"start_time": "2:0:0", "stop_time": "1:0:0"}',
+                    "",
+                    '{"start_color": {"r": 256}}',
+                    "[]",
+                    self.rule3.json(),
+                ]
+            ),
+        )
+
+        rules, report = load_rule_file(path)
+
+        self.assertListEqual([self.rule1, self.rule3], rules)
+        self.assertListEqual(
+            ["line 2", "line 3", "line 5", "line 6"],
+            [error.record for error in report.errors],
+        )
+        self.assertIn(
+            "stop_time: start_time is after stop_time", report.errors[1].error
+        )
+        self.assertIn("start_color.r", report.errors[2].error)
+
+    def test_validator_reuses_colors_and_times(self) -> None:
+        validator = RuleValidator()
+        record = json.loads(self.rule1.json())
+
+        rule1 = validator.rule(record)
+        rule2 = validator.rule(dict(record, day="Friday"))
+
+        self.assertEqual(rule1.start_color, rule2.start_color)
+        self.assertEqual(time(hour=1), rule2.start_time)
+        self.assertEqual(2, len(validator._colors))
+        self.assertEqual(2, len(validator._times))
+
+    def test_rule_manager_load_rules(self) -> None:
+        path = self.write(
+            "rules.jsonl",
+            "\n".join(rule.json() for rule in (self.rule1, self.rule2)),
+        )
+        rule_manager = RuleManager()
+
+        report = rule_manager.load_rules(path)
+
+        self.assertEqual(2, report.loaded)
+        # later rules win, as with add_rule
+        expected = RuleManager()
+        expected.add_rule(self.rule1)
+        expected.add_rule(self.rule2)
+        self.assertDictEqual(expected.rules, rule_manager.rules)
+
+    def test_rule_manager_load_rules_missing_file(self) -> None:
+        rule_manager = RuleManager()
+
+        self.assertIsNone(rule_manager.load_rules("does-not-exist.json"))
+
+    def test_load_default_rules(self) -> None:
+        rule_manager = RuleManager()
+
+        report = rule_manager.load_rules("default_rules.json")
+
+        self.assertListEqual([], report.errors)
+        self.assertTrue(all(rule_manager.rules.values()))
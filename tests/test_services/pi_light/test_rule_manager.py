@@ -1,4 +1,7 @@
-from datetime import datetime
+import json
+import threading
+from datetime import datetime, timedelta
+from random import Random
 from zoneinfo import ZoneInfo
 
 import pytest
@@ -6,10 +9,12 @@ import time_machine
 from pydantic import ValidationError
 from testslide import TestCase
 
-from app.services.pi_light.color import Color
+from app.services.pi_light.color import Color, Pixel
 from app.services.pi_light.day import Day
 from app.services.pi_light.rule import Rule
 from app.services.pi_light.rule_manager import RuleDoesNotExistError, RuleManager
+from app.services.pi_light.zone import Zone
+from app.services.simple_time import to_time
 
 
 class TestRuleManager(TestCase):
@@ -245,6 +250,105 @@ class TestRuleManager(TestCase):
             self.rule_manager.rules[day],
         )
 
+    def test_rules_conflict_same_start(self) -> None:
+        day = Day.TUESDAY
+        rule1 = Rule(day=day, start_time=5, stop_time=19)
+        rule2 = Rule(day=day, start_time=5, stop_time=8)
+
+        new_rule1 = Rule(day=day, start_time=9, stop_time=19)
+
+        self.rule_manager.add_rule(rule1)
+        self.rule_manager.add_rule(rule2)
+
+        self.assertListEqual([rule2, new_rule1], self.rule_manager.rules[day])
+
+    def test_rules_conflict_same_stop(self) -> None:
+        day = Day.TUESDAY
+        rule1 = Rule(day=day, start_time=5, stop_time=19)
+        rule2 = Rule(day=day, start_time=12, stop_time=19)
+
+        new_rule1 = Rule(day=day, start_time=5, stop_time=11)
+
+        self.rule_manager.add_rule(rule1)
+        self.rule_manager.add_rule(rule2)
+
+        self.assertListEqual([new_rule1, rule2], self.rule_manager.rules[day])
+
+    def test_rules_conflict_drop_single_second(self) -> None:
+        day = Day.TUESDAY
+        rule1 = Rule(day=day, start_time=5, stop_time=19)
+        rule2 = Rule(day=day, start_time=6, stop_time=18)
+
+        self.rule_manager.add_rule(rule1)
+        self.rule_manager.add_rule(rule2)
+
+        self.assertListEqual([rule2], self.rule_manager.rules[day])
+
+    def test_add_rule_last_added_wins(self) -> None:
+        day = Day.SUNDAY
+        random = Random(42)
+        expected = [None] * 300
+        # even starts and odd stops, so no overlap leaves a one second rule
+        for _ in range(500):
+            start = random.randrange(0, 298, 2)
+            stop = random.randrange(start + 1, min(start + 30, 299), 2)
+            color = Color.random()
+            self.rule_manager.add_rule(
+                Rule(
+                    day=day,
+                    start_time=to_time(start),
+                    stop_time=to_time(stop),
+                    start_color=color,
+                )
+            )
+            expected[start : stop + 1] = [color] * (stop + 1 - start)
+
+        actual = [None] * 300
+        previous_stop = -1
+        for rule in self.rule_manager.rules[day]:
+            self.assertGreater(rule.start_seconds, previous_stop)
+            previous_stop = rule.stop_seconds
+            actual[rule.start_seconds : rule.stop_seconds + 1] = [rule.start_color] * (
+                rule.stop_seconds + 1 - rule.start_seconds
+            )
+        self.assertListEqual(expected, actual)
+
+    def test_add_rules_same_as_add_rule(self) -> None:
+        random = Random(7)
+        rules = []
+        for _ in range(400):
+            start = random.randrange(0, 3000)
+            stop = random.randrange(start + 1, min(start + 200, 3001))
+            rules.append(
+                Rule(
+                    day=random.choice([Day.MONDAY, Day.TUESDAY]),
+                    start_time=to_time(start),
+                    stop_time=to_time(stop),
+                    start_color=Color.random(),
+                )
+            )
+        expected = RuleManager()
+        for rule in rules:
+            expected.add_rule(rule)
+
+        self.rule_manager.add_rules(rules[:100])
+        self.rule_manager.add_rules(rules[100:])
+
+        self.assertDictEqual(expected.rules, self.rule_manager.rules)
+        self.assertListEqual(
+            list(expected.rule_set.schedules[Day.MONDAY].starts),
+            list(self.rule_manager.rule_set.schedules[Day.MONDAY].starts),
+        )
+
+    def test_add_rules_notifies_once(self) -> None:
+        changes = []
+        self.rule_manager.add_listener(lambda: changes.append(True))
+
+        self.rule_manager.add_rules([Rule(day=Day.MONDAY), Rule(day=Day.FRIDAY)])
+
+        self.assertEqual(1, len(changes))
+        self.assertEqual(1, len(self.rule_manager.rules[Day.FRIDAY]))
+
     def test_add_invalid_rule_invalid_start_time(self) -> None:
         with pytest.raises(ValidationError):
             self.rule_manager.add_rule(Rule(start_time=30, stop_time=8))
@@ -261,6 +365,92 @@ class TestRuleManager(TestCase):
         with pytest.raises(ValidationError):
             self.rule_manager.add_rule(Rule(start_color=Color(r=-1)))
 
+    def test_listeners_notified(self) -> None:
+        changes = []
+        rule = Rule(day=Day.MONDAY)
+        self.rule_manager.add_listener(lambda: changes.append(True))
+
+        self.rule_manager.add_rule(rule)
+        self.rule_manager.remove_rule(rule)
+
+        self.assertEqual(2, len(changes))
+
+    def test_published_rule_sets_are_not_modified(self) -> None:
+        rule1 = Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0")
+        rule2 = Rule(day=Day.MONDAY, start_time="1:30:0", stop_time="3:0:0")
+        self.rule_manager.add_rule(rule1)
+        before = self.rule_manager.rule_set
+
+        self.rule_manager.add_rule(rule2)
+        self.rule_manager.remove_rules_by_hash([hash(rule2)])
+
+        self.assertListEqual([rule1], before.rules[Day.MONDAY])
+        self.assertEqual([3600], list(before.schedules[Day.MONDAY].starts))
+        self.assertIs(before.rules[Day.FRIDAY], self.rule_manager.rules[Day.FRIDAY])
+        self.assertEqual(before.version + 2, self.rule_manager.version)
+
+    def test_concurrent_readers(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        random = Random(5)
+        rules = []
+        for _ in range(300):
+            start = random.randrange(0, 83000)
+            rules.append(
+                Rule(
+                    day=day,
+                    start_time=to_time(start),
+                    stop_time=to_time(start + random.randrange(1, 3000)),
+                    start_color=Color.random(),
+                )
+            )
+        errors = []
+        done = threading.Event()
+
+        def read() -> None:
+            try:
+                while not done.is_set():
+                    rule_set = self.rule_manager.rule_set
+                    schedule = rule_set.schedules[day]
+                    self.assertEqual(len(rule_set.rules[day]), len(schedule))
+                    self.assertEqual(
+                        [rule.start_seconds for rule in rule_set.rules[day]],
+                        list(schedule.starts),
+                    )
+                    self.rule_manager.current_rule()
+                    self.rule_manager.current_pixel()
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        for rule in rules:
+            self.rule_manager.add_rule(rule)
+        for rule in list(self.rule_manager.rules[day])[::2]:
+            self.rule_manager.remove_rule(rule)
+        done.set()
+        for reader in readers:
+            reader.join()
+
+        self.assertListEqual([], errors)
+
+    def test_rules_json_cached_until_changed(self) -> None:
+        rule = Rule(day=Day.MONDAY)
+        version = self.rule_manager.version
+
+        etag, body = self.rule_manager.rules_json()
+
+        self.assertIs(body, self.rule_manager.rules_json()[1])
+        self.rule_manager.add_rule(rule)
+        self.assertEqual(version + 1, self.rule_manager.version)
+        new_etag, new_body = self.rule_manager.rules_json()
+        self.assertNotEqual(etag, new_etag)
+        self.assertEqual(
+            [json.loads(rule.json())], json.loads(new_body)[Day.MONDAY.value]
+        )
+        self.rule_manager.remove_rule(rule)
+        self.assertEqual((etag, body), self.rule_manager.rules_json())
+
     def test_remove_rule(self) -> None:
         day = Day(datetime.now().strftime("%A"))
         rule1 = Rule(day=day, start_time="0:0:0", stop_time="0:0:2")
@@ -314,6 +504,43 @@ class TestRuleManager(TestCase):
         with pytest.raises(RuleDoesNotExistError):
             self.rule_manager.remove_rule_by_hash(hash(rule3))
 
+    def test_remove_rules_by_hash(self) -> None:
+        rule1 = Rule(day=Day.MONDAY, start_time="0:0:0", stop_time="0:0:2")
+        rule2 = Rule(day=Day.MONDAY, start_time="0:0:4", stop_time="0:0:6")
+        rule3 = Rule(day=Day.FRIDAY, start_time="0:0:9", stop_time="0:0:59")
+        self.rule_manager.add_rules([rule1, rule2, rule3])
+        changes = []
+        self.rule_manager.add_listener(lambda: changes.append(True))
+
+        missing = self.rule_manager.remove_rules_by_hash(
+            [hash(rule1), 1234, hash(rule3)]
+        )
+
+        self.assertListEqual([1234], missing)
+        self.assertListEqual([rule2], self.rule_manager.rules[Day.MONDAY])
+        self.assertListEqual([], self.rule_manager.rules[Day.FRIDAY])
+        self.assertEqual(
+            [4], list(self.rule_manager.rule_set.schedules[Day.MONDAY].starts)
+        )
+        self.assertEqual(1, len(changes))
+
+    def test_remove_rule_by_hash_split_rule(self) -> None:
+        rule1 = Rule(day=Day.MONDAY, start_time="0:0:0", stop_time="0:0:20")
+        rule2 = Rule(day=Day.MONDAY, start_time="0:0:5", stop_time="0:0:9")
+        self.rule_manager.add_rule(rule1)
+        self.rule_manager.add_rule(rule2)
+        head, _, tail = self.rule_manager.rules[Day.MONDAY]
+
+        with pytest.raises(RuleDoesNotExistError):
+            self.rule_manager.remove_rule_by_hash(hash(rule1))
+        self.rule_manager.remove_rule_by_hash(hash(tail))
+        self.rule_manager.remove_rule(rule2)
+
+        self.assertListEqual([head], self.rule_manager.rules[Day.MONDAY])
+        self.assertEqual(
+            [0], list(self.rule_manager.rule_set.schedules[Day.MONDAY].starts)
+        )
+
     @time_machine.travel(datetime(2021, 4, 27, 0, 0, 5, tzinfo=chicago_tz))
     def test_current_rule(self) -> None:
         day = Day(datetime.now().strftime("%A"))
@@ -344,6 +571,39 @@ class TestRuleManager(TestCase):
         self.assertEqual(None, actual_rule)
         self.assertEqual(0.0, percentage)
 
+    @time_machine.travel(datetime(2021, 4, 27, 0, 0, 5, tzinfo=chicago_tz))
+    def test_current_rule_after_remove(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        rule1 = Rule(day=day, start_time="0:0:0", stop_time="0:0:2")
+        rule2 = Rule(day=day, start_time="0:0:4", stop_time="0:0:6")
+        rule3 = Rule(day=day, start_time="0:0:8", stop_time="0:0:20")
+
+        self.rule_manager.add_rule(rule1)
+        self.rule_manager.add_rule(rule2)
+        self.rule_manager.add_rule(rule3)
+        self.rule_manager.remove_rule(rule2)
+
+        self.assertEqual((None, 0.0), self.rule_manager.current_rule())
+
+    @time_machine.travel(datetime(2021, 4, 27, 10, 0, 30, tzinfo=chicago_tz))
+    def test_current_rule_many_rules(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        for minute in range(0, 24 * 60, 2):
+            self.rule_manager.add_rule(
+                Rule(
+                    day=day,
+                    start_time=f"{minute // 60}:{minute % 60}:0",
+                    stop_time=f"{minute // 60}:{minute % 60}:59",
+                )
+            )
+
+        actual_rule, percentage = self.rule_manager.current_rule()
+
+        self.assertEqual(
+            Rule(day=day, start_time="10:0:0", stop_time="10:0:59"), actual_rule
+        )
+        self.assertAlmostEqual(30 / 59, percentage, delta=0.01)
+
     @time_machine.travel(datetime(2021, 4, 27, 0, 0, 5, tzinfo=chicago_tz))
     def test_next_rule_in_rule(self) -> None:
         day = Day(datetime.now().strftime("%A"))
@@ -472,6 +732,15 @@ class TestRuleManager(TestCase):
             expected_color.brightness, self.rule_manager.current_color().brightness, 4
         )
 
+    @time_machine.travel(datetime(2021, 4, 27, 0, 0, 5, tzinfo=chicago_tz))
+    def test_next_change(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        rule = Rule(day=day, start_time="0:0:30", stop_time="0:1:0")
+
+        self.rule_manager.add_rule(rule)
+
+        self.assertAlmostEqual(25, self.rule_manager.next_change(), delta=0.01)
+
     @time_machine.travel(datetime(2021, 4, 27, 13, 2, 3, tzinfo=chicago_tz))
     def test_color_multiple_rules(self) -> None:
         day = Day(datetime.now().strftime("%A"))
@@ -486,3 +755,94 @@ class TestRuleManager(TestCase):
         self.rule_manager.add_rule(rule2)
 
         self.assertEqual(color2, self.rule_manager.current_color())
+
+    def test_zone_rules(self) -> None:
+        day = Day.MONDAY
+        zone = Zone(first=10, last=19)
+        rule1 = Rule(day=day, start_time=1, stop_time=8)
+        rule2 = Rule(day=day, start_time=5, stop_time=19, zone=zone)
+        rule3 = Rule(day=day, start_time=1, stop_time=6, zone=zone)
+
+        self.rule_manager.add_rules([rule1, rule2, rule3])
+
+        self.assertListEqual([rule1], self.rule_manager.rules[day])
+        self.assertListEqual(
+            [rule3, Rule(day=day, start_time=7, stop_time=19, zone=zone)],
+            self.rule_manager.rule_set.layer(zone).rules[day],
+        )
+        self.assertListEqual([None, zone], list(self.rule_manager.rule_set.layers))
+        self.assertEqual(3, len(self.rule_manager.rule_set.all_rules()[day]))
+
+        self.rule_manager.remove_rules_by_hash(
+            [hash(rule) for rule in self.rule_manager.rule_set.layer(zone).rules[day]]
+        )
+
+        self.assertListEqual([None], list(self.rule_manager.rule_set.layers))
+        self.assertListEqual([rule1], self.rule_manager.rules[day])
+
+    @time_machine.travel(datetime(2021, 4, 27, 0, 0, 5, tzinfo=chicago_tz))
+    def test_current_layers(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        zone = Zone(first=0, last=4)
+        color = Color(r=1, g=2, b=3)
+        self.rule_manager.add_rule(Rule(day=day, start_time=0, stop_time=60))
+        self.rule_manager.add_rule(
+            Rule(
+                day=day,
+                start_time=0,
+                stop_time=20,
+                start_color=color,
+                stop_color=color,
+                zone=zone,
+            )
+        )
+
+        layers = self.rule_manager.current_layers()
+
+        self.assertListEqual([None, zone], [zone for zone, _ in layers])
+        self.assertEqual(Pixel.from_color(color), layers[1][1])
+        self.assertAlmostEqual(16, self.rule_manager.next_change(), delta=0.01)
+
+    @time_machine.travel(datetime(2021, 4, 27, 10, 0, 0, tzinfo=chicago_tz))
+    def test_current_layers_skip_inactive_zones(self) -> None:
+        day = Day(datetime.now().strftime("%A"))
+        red = Color(r=255, g=0, b=0, brightness=1.0)
+        zone = Zone(first=0, last=9)
+        self.rule_manager.add_rule(
+            Rule(day=day, start_time="9:0:0", start_color=red, stop_color=red)
+        )
+        self.rule_manager.add_rule(
+            Rule(day=day, start_time="20:0:0", stop_time="21:0:0", zone=zone)
+        )
+        self.rule_manager.add_rule(
+            Rule(day=Day.MONDAY, start_time="9:0:0", stop_time="11:0:0", zone=zone)
+        )
+
+        self.assertListEqual(
+            [(None, Pixel(255, 0, 0, 1.0))], self.rule_manager.current_layers()
+        )
+
+    def test_current_segments_follow_rules_not_gradients(self) -> None:
+        start = datetime(2021, 4, 27, 10, 0, 0, tzinfo=self.chicago_tz)
+        day = Day(start.strftime("%A"))
+        self.rule_manager.add_rule(
+            Rule(
+                day=day,
+                start_time="9:0:0",
+                stop_time="10:59:59",
+                start_color=Color(r=0, brightness=1.0),
+                stop_color=Color(r=255, brightness=1.0),
+            )
+        )
+        self.rule_manager.add_rule(Rule(day=day, start_time="11:0:0"))
+
+        with time_machine.travel(start):
+            segments, layers = self.rule_manager.current_segments()
+        with time_machine.travel(start + timedelta(minutes=30)):
+            later_segments, later_layers = self.rule_manager.current_segments()
+        with time_machine.travel(start + timedelta(hours=1)):
+            next_segments, _ = self.rule_manager.current_segments()
+
+        self.assertNotEqual(layers, later_layers)
+        self.assertEqual(segments, later_segments)
+        self.assertNotEqual(segments, next_segments)
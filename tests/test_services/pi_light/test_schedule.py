@@ -0,0 +1,99 @@
+from unittest import TestCase
+
+from app.services.pi_light.color import Color, Pixel
+from app.services.pi_light.day import Day
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.schedule import DaySchedule, pack_rgb, unpack_rgb
+
+
+class TestDaySchedule(TestCase):
+    def setUp(self) -> None:
+        self.start_color = Color(r=10, g=20, b=30, brightness=0.2)
+        self.stop_color = Color(r=110, g=0, b=255, brightness=0.6)
+        self.rule1 = Rule(day=Day.MONDAY, start_time="0:0:0", stop_time="0:0:2")
+        self.rule2 = Rule(
+            day=Day.MONDAY,
+            start_time="0:1:0",
+            stop_time="0:2:40",
+            start_color=self.start_color,
+            stop_color=self.stop_color,
+        )
+        self.schedule = DaySchedule([self.rule1, self.rule2])
+
+    def test_pack_rgb(self) -> None:
+        self.assertEqual(0x0A141E, pack_rgb(self.start_color))
+        self.assertEqual((10, 20, 30), unpack_rgb(pack_rgb(self.start_color)))
+
+    def test_compile(self) -> None:
+        self.assertEqual(2, len(self.schedule))
+        self.assertEqual([0, 60], list(self.schedule.starts))
+        self.assertEqual([2, 160], list(self.schedule.stops))
+        self.assertEqual([0.0, 0.2], list(self.schedule.start_brightness))
+
+    def test_find(self) -> None:
+        self.assertEqual(0, self.schedule.find(1.5))
+        self.assertEqual(-1, self.schedule.find(2.5))
+        self.assertEqual(1, self.schedule.find(60))
+        self.assertEqual(1, self.schedule.find(160))
+        self.assertEqual(-1, self.schedule.find(161))
+        self.assertEqual(0, self.schedule.find(0))
+
+    def test_pixel_at(self) -> None:
+        for now in (60, 61, 99, 110, 159, 160):
+            expected_color = Color.gradient(
+                self.start_color,
+                self.stop_color,
+                self.schedule.percentage(1, now),
+            )
+            self.assertEqual(expected_color, self.schedule.pixel_at(now).to_color())
+
+    def test_pixel_at_no_rule(self) -> None:
+        self.assertEqual(Pixel(), self.schedule.pixel_at(30))
+        self.assertEqual(Pixel(), DaySchedule().pixel_at(30))
+        self.assertIsNone(self.schedule.active_pixel(30))
+        self.assertEqual(self.schedule.pixel_at(60), self.schedule.active_pixel(60))
+
+    def test_pixel_at_unchanged_is_cached(self) -> None:
+        rule = Rule(
+            day=Day.MONDAY, start_color=self.start_color, stop_color=self.start_color
+        )
+        schedule = DaySchedule([rule])
+
+        self.assertIs(schedule.pixel_at(10), schedule.pixel_at(11))
+
+    def test_splice(self) -> None:
+        rule3 = Rule(day=Day.MONDAY, start_time="0:0:5", stop_time="0:0:10")
+
+        self.schedule.splice(1, 1, [rule3])
+
+        self.assertEqual([0, 5, 60], list(self.schedule.starts))
+        self.assertEqual(1, self.schedule.find(7))
+
+        self.schedule.splice(0, 2, [])
+
+        self.assertEqual([60], list(self.schedule.starts))
+
+    def test_next_change_between_rules(self) -> None:
+        self.assertEqual(30, self.schedule.next_change(30))
+        self.assertEqual(86400 - 170, self.schedule.next_change(170))
+
+    def test_next_change_constant_rule(self) -> None:
+        self.assertEqual(1.75, self.schedule.next_change(1.25))
+
+    def test_next_change_gradient(self) -> None:
+        stop_color = Color(r=12, g=19, b=30, brightness=0.2)
+        rule = Rule(
+            day=Day.MONDAY,
+            start_time="1:0:0",
+            stop_time="2:0:0",
+            start_color=self.start_color,
+            stop_color=stop_color,
+        )
+        schedule = DaySchedule([rule])
+
+        for now in (3600, 3600.5, 4000, 5000.25, 7000):
+            change = now + schedule.next_change(now)
+            color = schedule.pixel_at(now)
+            for second in range(int(now) + 1, int(change)):
+                self.assertEqual(color, schedule.pixel_at(second))
+            self.assertNotEqual(color, schedule.pixel_at(change))
@@ -0,0 +1,101 @@
+import os
+from random import Random
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import pytest
+
+from app.services.pi_light import snapshot
+from app.services.pi_light.color import Color
+from app.services.pi_light.day import Day
+from app.services.pi_light.rule import Rule
+from app.services.pi_light.rule_manager import RuleManager
+from app.services.pi_light.schedule import ARRAYS
+from app.services.pi_light.zone import Zone
+from app.services.simple_time import to_time
+
+
+class TestSnapshot(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "rules.snapshot")
+        random = Random(3)
+        self.rule_manager = RuleManager()
+        for _ in range(200):
+            start = random.randrange(0, 86000)
+            self.rule_manager.add_rule(
+                Rule(
+                    day=random.choice(list(Day)),
+                    start_time=to_time(start),
+                    stop_time=to_time(start + random.randrange(1, 400)),
+                    start_color=Color.random(),
+                    stop_color=Color.random(),
+                )
+            )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        self.rule_manager.save_snapshot(self.path)
+        loaded = RuleManager()
+
+        self.assertTrue(loaded.load_snapshot(self.path))
+
+        self.assertDictEqual(self.rule_manager.rules, loaded.rules)
+        for day in Day:
+            expected, actual = (
+                self.rule_manager.rule_set.schedules[day],
+                loaded.rule_set.schedules[day],
+            )
+            for name in ARRAYS:
+                self.assertEqual(getattr(expected, name), getattr(actual, name))
+            for now in range(0, 86400, 97):
+                self.assertEqual(expected.pixel_at(now), actual.pixel_at(now))
+        rule = loaded.rules[Day.FRIDAY][0]
+        self.assertEqual(hash(self.rule_manager.rules[Day.FRIDAY][0]), hash(rule))
+        loaded.remove_rule_by_hash(hash(rule))
+        self.assertNotIn(rule, loaded.rules[Day.FRIDAY])
+
+    def test_round_trip_zones(self) -> None:
+        zone = Zone(first=3, last=7)
+        rule = Rule(day=Day.MONDAY, start_time="1:0:0", stop_time="2:0:0", zone=zone)
+        self.rule_manager.add_rule(rule)
+        self.rule_manager.save_snapshot(self.path)
+        loaded = RuleManager()
+
+        loaded.load_snapshot(self.path)
+
+        self.assertDictEqual(
+            self.rule_manager.rule_set.all_rules(), loaded.rule_set.all_rules()
+        )
+        self.assertListEqual([rule], loaded.rule_set.layer(zone).rules[Day.MONDAY])
+        loaded.remove_rule_by_hash(hash(rule))
+        self.assertListEqual([None], list(loaded.rule_set.layers))
+
+    def test_save_replaces_atomically(self) -> None:
+        self.rule_manager.save_snapshot(self.path)
+        self.rule_manager.remove_rule(self.rule_manager.rules[Day.MONDAY][0])
+        self.rule_manager.save_snapshot(self.path)
+
+        self.assertListEqual(["rules.snapshot"], os.listdir(self.directory.name))
+        loaded = RuleManager()
+        loaded.load_snapshot(self.path)
+        self.assertDictEqual(self.rule_manager.rules, loaded.rules)
+
+    def test_load_invalid(self) -> None:
+        self.rule_manager.save_snapshot(self.path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        for content in (b"", data[:20], data[:-1], b"XXXX" + data[4:], data + b"0"):
+            with open(self.path, "wb") as f:
+                f.write(content)
+            with pytest.raises(snapshot.SnapshotError):
+                snapshot.load(self.path)
+
+    def test_load_missing(self) -> None:
+        rule_manager = RuleManager()
+
+        self.assertFalse(rule_manager.load_snapshot(self.path))
+        self.assertListEqual([], rule_manager.rules[Day.MONDAY])
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from app.services.pi_light.frame import new_frame
+from app.services.pi_light.transition import Transition
+from tests.test_services.pi_light.test_animation import FakeClock
+
+
+class TestTransition(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.source = bytes([0, 255, 100] * 3)
+        self.target = bytes([255, 0, 100] * 2 + [7, 8, 9])
+
+    def test_render(self) -> None:
+        transition = Transition(self.source, self.target, 1.0, fps=10, clock=self.clock)
+        frame = new_frame(3)
+        frames = []
+
+        while not transition.done:
+            self.clock.now += transition.render(frame)
+            frames.append(bytes(frame))
+
+        self.assertEqual(10, len(frames))
+        self.assertEqual(bytes([26, 230, 100]), frames[0][0:3])
+        self.assertEqual(bytes([128, 128, 100]), frames[4][0:3])
+        self.assertEqual(self.target, frames[-1])
+        for earlier, later in zip(frames, frames[1:]):
+            self.assertLessEqual(earlier[0], later[0])
+            self.assertGreaterEqual(earlier[1], later[1])
+        self.assertEqual(0.0, transition.remaining())
+
+    def test_render_skips_late_frames(self) -> None:
+        transition = Transition(self.source, self.target, 1.0, fps=10, clock=self.clock)
+        frame = new_frame(3)
+        transition.render(frame)
+        self.clock.now += 0.45
+
+        delay = transition.render(frame)
+
+        self.assertEqual(5, transition.step)
+        self.assertAlmostEqual(0.05, delay)
+        self.assertAlmostEqual(0.55, transition.remaining())
+        self.assertEqual(bytes([128, 128, 100]), frame[0:3])
+
+        self.clock.now += 5
+        self.assertEqual(0.0, transition.render(frame))
+        self.assertTrue(transition.done)
+        self.assertEqual(self.target, frame)
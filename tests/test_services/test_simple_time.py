@@ -1,7 +1,7 @@
 from datetime import time
 from unittest import TestCase
 
-from app.services.simple_time import SimpleTime
+from app.services.simple_time import SimpleTime, to_seconds, to_time
 
 
 class TestSimpleTime(TestCase):
@@ -36,3 +36,16 @@ class TestSimpleTime(TestCase):
     def test_total_seconds(self):
         self.assertEqual(600, SimpleTime(0, 10, 0).total_seconds())
         self.assertEqual(5400, SimpleTime(1, 30, 0).total_seconds())
+
+    def test_to_seconds(self):
+        self.assertEqual(600, to_seconds(time(0, 10, 0)))
+        self.assertEqual(86399, to_seconds(time(23, 59, 59)))
+        self.assertEqual(
+            SimpleTime(1, 30, 5).total_seconds(), to_seconds(time(1, 30, 5))
+        )
+
+    def test_to_time(self):
+        self.assertEqual(time(0, 10, 0), to_time(600))
+        self.assertEqual(time(23, 59, 59), to_time(-1))
+        self.assertEqual(time(0, 0, 0), to_time(86400))
+        self.assertEqual(SimpleTime.from_seconds(5405).time(), to_time(5405))